@@ -0,0 +1,184 @@
+import numpy as np
+
+from math_functions import *
+from Obstacle import *
+
+
+class Bug2Planner:
+	"""
+	Event-driven version of the Bug2 algorithm of the Bug2 practical
+
+	Instead of advancing the robot in fixed steps, the planner works on the polygon
+	edges directly:
+	- motion to goal: the segment from the robot to the goal is intersected with all
+	  the obstacle edges at once, and the first point where it enters an obstacle is
+	  the hit point
+	- boundary following: the robot walks the boundary of the obstacle edge by edge,
+	  in the direction of the tangent vector of Polygon.compute_tangent_vector_to_polygon
+	  (from vertex i to vertex i+1). Every edge is intersected with the start-goal line
+	  (m-line), and the robot leaves the obstacle at the first crossing that is closer
+	  to the goal than the hit point. If the edge runs into another obstacle, the robot
+	  starts following that one instead
+
+	The cost of a plan depends on the number of edges visited and not on the path
+	length. The robot moves along the obstacle boundaries (no clearance).
+
+	After plan, self.events holds the ('hit', point, obstacle index) and ('leave', point,
+	obstacle index) events in order and self.waypoints the polyline of the path.
+	generate_dense_path samples it with a fixed step, as the step-based algorithm does,
+	for animations
+	"""
+
+	def __init__(self, obstacles, max_events=1000, tol=1e-9):
+		for obs in obstacles:
+			if isinstance(obs, Circle):
+				raise ValueError("Bug2Planner only supports polygon obstacles")
+
+		self.obstacles = list(obstacles)
+		self.field = ObstacleField(self.obstacles)
+		self.max_events = max_events
+		self.tol = tol
+
+		self.events = []
+		self.waypoints = np.zeros((0, 2))
+		self.success = False
+
+	def __is_entering__(self, point, direction, k):
+		# True if moving a small distance from point along direction goes into obstacle k
+		probe = point + 1e-6 * direction / np.linalg.norm(direction)
+		inside, _ = self.obstacles[k].compute_points_containment(probe)
+		return bool(inside[0])
+
+	def __first_hit__(self, point, goal):
+		"""
+		First point of the segment [point, goal] where it enters an obstacle.
+		Method returns (hit point, obstacle index, local edge index, s) or None
+		"""
+		direction = goal - point
+		s, u, valid = compute_segment_intersections(point, goal, self.field.segments, self.tol)
+
+		for j in np.flatnonzero(valid)[np.argsort(s[valid], kind='stable')]:
+			hit = point + max(s[j], 0.0) * direction
+			k = self.field.segment_owner[j]
+			if self.__is_entering__(hit, direction, k):
+				return hit, int(k), int(self.field.segment_local[j]), s[j]
+
+		return None
+
+	def __follow_boundary__(self, hit, k, i, start, goal):
+		"""
+		Walks the boundary from the hit point, which lies on edge i of obstacle k.
+		Method returns the list of points visited (ending at the leave point) and the
+		obstacle it leaves, or None as obstacle if the robot gets back to the hit point
+		"""
+		m_direction = goal - start
+		hit_dist = compute_distance_between_points(hit, goal)
+		hit_obstacle, hit_edge = k, i
+
+		points = []
+		current = hit
+		max_edges = 2 * self.field.segments.shape[0] + 2
+		for n_edges in range(max_edges):
+			vertices = np.asarray(self.obstacles[k].vertices, dtype=float)
+			end = vertices[(i + 1) % len(vertices)]
+
+			# When the robot is back on the hit edge, it must not go past the hit point
+			back_at_hit = n_edges > 0 and k == hit_obstacle and i == hit_edge and \
+				compute_distance_between_points(current, end) >= compute_distance_between_points(hit, end) - self.tol
+			target = hit if back_at_hit else end
+			edge_direction = target - current
+
+			events = []
+			if np.linalg.norm(edge_direction) > self.tol:
+				# Leave: crossing with the m-line closer to the goal than the hit point
+				denom = edge_direction[0] * m_direction[1] - edge_direction[1] * m_direction[0]
+				if abs(denom) > self.tol * np.linalg.norm(edge_direction) * np.linalg.norm(m_direction):
+					offset = start - current
+					s = (offset[0] * m_direction[1] - offset[1] * m_direction[0]) / denom
+					leave = current + s * edge_direction
+					if -self.tol <= s <= 1 + self.tol and \
+						compute_distance_between_points(leave, goal) < hit_dist - self.tol:
+						events.append((s, 'leave', leave, k, i))
+
+				# Switch: the edge enters another obstacle
+				s, u, valid = compute_segment_intersections(current, target, self.field.segments, self.tol)
+				valid &= (self.field.segment_owner != k) & (s > self.tol)
+				for j in np.flatnonzero(valid):
+					point = current + s[j] * edge_direction
+					k_new = int(self.field.segment_owner[j])
+					if self.__is_entering__(point, edge_direction, k_new):
+						events.append((s[j], 'switch', point, k_new, int(self.field.segment_local[j])))
+
+			if events:
+				_, kind, point, k_event, i_event = min(events, key=lambda event: event[0])
+				points.append(point)
+				if kind == 'leave':
+					return points, k
+				current, k, i = point, k_event, i_event
+				continue
+
+			if back_at_hit:
+				points.append(hit)
+				return points, None
+
+			points.append(end)
+			current = end
+			i = (i + 1) % len(vertices)
+
+		return points, None
+
+	def plan(self, start, goal):
+		"""
+		Computes the Bug2 path from start to goal
+
+		Method returns the (N,2) waypoints of the path. self.success is False if the
+		goal cannot be reached, in which case the path ends where the robot gave up
+		"""
+		start = np.asarray(start, dtype=float)
+		goal = np.asarray(goal, dtype=float)
+
+		self.events = []
+		self.success = False
+		waypoints = [start]
+		current = start
+
+		while len(self.events) < self.max_events:
+			# Motion to goal
+			result = self.__first_hit__(current, goal)
+			if result is None:
+				waypoints.append(goal)
+				self.success = True
+				break
+
+			hit, k, i, _ = result
+			waypoints.append(hit)
+			self.events.append(('hit', hit, k))
+
+			# Boundary following
+			points, k_leave = self.__follow_boundary__(hit, k, i, start, goal)
+			waypoints.extend(points)
+			if k_leave is None:
+				break
+
+			current = points[-1]
+			self.events.append(('leave', current, k_leave))
+
+		waypoints = np.array(waypoints, dtype=float)
+		# Remove repeated waypoints (e.g. a hit point on a vertex)
+		keep = np.r_[True, np.any(np.abs(np.diff(waypoints, axis=0)) > self.tol, axis=1)]
+		self.waypoints = waypoints[keep]
+		return self.waypoints
+
+	def generate_dense_path(self, step_size=0.5):
+		"""
+		Points along the planned path every step_size, for animations
+		"""
+		waypoints = self.waypoints
+		lengths = np.hypot(*np.diff(waypoints, axis=0).T)
+		s_path = np.concatenate(([0], np.cumsum(lengths)))
+		s = np.append(np.arange(0, s_path[-1], step_size), s_path[-1])
+
+		keep = np.r_[True, lengths > 0]
+		x = np.interp(s, s_path[keep], waypoints[keep, 0])
+		y = np.interp(s, s_path[keep], waypoints[keep, 1])
+		return np.vstack((x, y)).T
@@ -21,22 +21,19 @@ class Polygon:
 		- indices of segment closest to point_q
 
 		"""        
-		dist = np.inf
-		segment_idx = None
-		closest_point = None
 		len_polygon = self.vertices.shape[0]
+		segments = np.stack((self.vertices, np.roll(self.vertices, -1, axis=0)), axis=1)
 		
-		for i in range(len_polygon):
-			case, seg_dist, _ = compute_distance_point_to_segment(self.vertices[i],
-																  self.vertices[(i+1) % len_polygon], point_q)
-			if seg_dist <= dist:
-				dist = seg_dist
-				if case == 0:
-					closest_point = i
-				elif case == 1:
-					closest_point = i
-				else:
-					closest_point = (i+1) % len_polygon                
+		cases, seg_dists, _ = compute_distances_points_to_segments(point_q, segments)
+		cases, seg_dists = cases[0], seg_dists[0]
+		
+		# Ties are resolved in favour of the last segment, as in a sequential scan
+		i = len_polygon - 1 - np.argmin(seg_dists[::-1])
+		dist = seg_dists[i]
+		if cases[i] == 2:
+			closest_point = (i+1) % len_polygon
+		else:
+			closest_point = i
 		
 		segment_idx = (closest_point, (closest_point+1) % len_polygon)
 		# print("Closest segment is {}, {}".format(segment_idx[0], segment_idx[1]))
@@ -94,34 +91,33 @@ class Polygon:
 		return coordinates
 
 
-	def is_in_collision_with_points(self, points, min_dist=2.5):
+	def compute_points_containment(self, points):
+		"""
+		Vectorized even-odd containment test for an (N,2) array of points
 
-		# First check if point is within polygon
-		points_in_collision = []
+		Method returns:
+		- (N,) boolean mask, True for points strictly inside the polygon
+		- (N,) array with the minimum distance from each point to the polygon edges
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		segments = np.stack((self.vertices, np.roll(self.vertices, -1, axis=0)), axis=1)
 
-		for point in points:
-			count_collisions = 0
-			p_x, p_y = point
-			for i in range(self.vertices.shape[0]-2):
-				j = i - 1 if i != 0 else self.vertices.shape[0]-2
-				v1 = self.vertices[i]
-				v2 = self.vertices[j]
+		crossings = compute_edge_crossings(points, segments)
+		inside = np.count_nonzero(crossings, axis=1) % 2 == 1
 
-				if ((v1[1] > p_y) != (v2[1] > p_y)) and (p_x < (v2[0] - v1[0]) * (p_y - v1[1]) / (v2[1] - v1[1] + v1[0])):
-					count_collisions += 1
+		_, seg_dists, _ = compute_distances_points_to_segments(points, segments)
+		clearance = np.min(seg_dists, axis=1)
 
-			if count_collisions % 2 == 1:
-				points_in_collision.append(point)
-		
-		if len(points_in_collision):
-			return True
+		return inside, clearance
 
-		# Second check if point is in collision with edges
-		dist, _ = self.compute_distance_point_to_polygon(points[-1])
-		if dist < min_dist:
-			return True
 
-		return False
+	def is_in_collision_with_points(self, points, min_dist=2.5):
+		"""
+		A set of points is in collision if any point is inside the polygon or 
+		closer than min_dist to any of its edges
+		"""
+		inside, clearance = self.compute_points_containment(points)
+		return bool(np.any(inside) or np.any(clearance < min_dist))
 
 
 	def get_perimeter(self):
@@ -165,16 +161,197 @@ class Circle:
 		self.center = np.array([c_x, c_y])
 		self.radius = radius
 
+	def compute_points_containment(self, points):
+		"""
+		Method returns:
+		- (N,) boolean mask, True for points inside or on the circle
+		- (N,) array with the distance from each point to the circle boundary
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		dx = self.center[0] - points[:, 0]
+		dy = self.center[1] - points[:, 1]
+		dist_sq = dx * dx + dy * dy
+		return dist_sq <= self.radius ** 2, np.abs(np.sqrt(dist_sq) - self.radius)
+
 	def is_in_collision_with_points(self, points):
+		inside, _ = self.compute_points_containment(points)
+		return bool(np.any(inside))
+
+
+class ObstacleField:
+	"""
+	Packs a list of obstacles (Polygon, Rectangle and Circle objects) into 
+	contiguous arrays so that distance queries against all obstacles are done
+	in a single vectorized call
+	
+	- segments: (E,2,2) array with the edges of all polygons
+	- segment_owner: (E,) index of the obstacle each edge belongs to
+	- centers, radii: circles stored as (C,2) and (C,) arrays
+	
+	"""
+
+	def __init__(self, obstacles):
+		self.obstacles = list(obstacles)
+		
+		segments, segment_owner, segment_local = [], [], []
+		centers, radii, circle_owner = [], [], []
+		
+		for k, obs in enumerate(self.obstacles):
+			if isinstance(obs, Circle):
+				centers.append(obs.center)
+				radii.append(obs.radius)
+				circle_owner.append(k)
+			else:
+				vertices = np.asarray(obs.vertices, dtype=float)
+				len_polygon = vertices.shape[0]
+				segments.append(np.stack((vertices, np.roll(vertices, -1, axis=0)), axis=1))
+				segment_owner.append(np.full(len_polygon, k))
+				segment_local.append(np.arange(len_polygon))
+				
+		if segments:
+			self.segments = np.concatenate(segments, axis=0)
+			self.segment_owner = np.concatenate(segment_owner)
+			self.segment_local = np.concatenate(segment_local)
+		else:
+			self.segments = np.zeros((0, 2, 2))
+			self.segment_owner = np.zeros(0, dtype=int)
+			self.segment_local = np.zeros(0, dtype=int)
+		
+		self.centers = np.array(centers, dtype=float).reshape(-1, 2)
+		self.radii = np.array(radii, dtype=float)
+		self.circle_owner = np.array(circle_owner, dtype=int)
+		
+	def __len__(self):
+		return len(self.obstacles)
+
+	def __compute_distances__(self, points):
+		# Returns the w-case codes and distances to every edge as well as the 
+		# (N,K) distances to every obstacle
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		distances = np.full((points.shape[0], len(self.obstacles)), np.inf)
+		cases = np.zeros((points.shape[0], 0), dtype=int)
+		seg_dists = np.zeros((points.shape[0], 0))
+		
+		if self.segments.shape[0]:
+			cases, seg_dists, _ = compute_distances_points_to_segments(points, self.segments)
+			# Edges of the same polygon are contiguous, so reduce them per polygon
+			starts = np.flatnonzero(np.r_[True, np.diff(self.segment_owner) != 0])
+			distances[:, self.segment_owner[starts]] = np.minimum.reduceat(seg_dists, starts, axis=1)
+		
+		if self.centers.shape[0]:
+			diff = points[:, None, :] - self.centers[None, :, :]
+			distances[:, self.circle_owner] = np.hypot(diff[:, :, 0], diff[:, :, 1]) - self.radii
+		
+		return cases, seg_dists, distances
+
+	def compute_distances_points_to_obstacles(self, points):
+		"""
+		Compute the distance from every point to every obstacle
 
-		dist = []
-		for point in points:
-			dx = self.center[0] - point[0]
-			dy = self.center[1] - point[1]
+		Method returns:
+		- (N,K) array with the distance from each of the N points to each of the K obstacles.
+		  Distance to a circle is measured to its boundary and is negative inside it.
+		"""
+		_, _, distances = self.__compute_distances__(points)
+		return distances
+
+	def find_closest_obstacle(self, point_q):
+		"""
+		Find the obstacle closest to point_q and the direction to go around it
+		
+		Method returns:
+		- index of the closest obstacle in self.obstacles
+		- dist: minimal distance from point_q to that obstacle
+		- indices of the polygon segment closest to point_q (None for circles)
+		- unit-length tangent vector, as given by Polygon.compute_tangent_vector_to_polygon.
+		  For circles, the tangent is the counter-clockwise direction around the center
+		
+		On an empty field there is no closest obstacle, and the method returns
+		(None, inf, None, None)
+		"""
+		point_q = np.asarray(point_q, dtype=float)
+		if len(self.obstacles) == 0:
+			return None, np.inf, None, None
+		
+		cases, seg_dists, distances = self.__compute_distances__(point_q)
+		cases, seg_dists, distances = cases[0], seg_dists[0], distances[0]
+		
+		closest_obs = int(np.argmin(distances))
+		dist = distances[closest_obs]
+		
+		if isinstance(self.obstacles[closest_obs], Circle):
+			radial = point_q - self.obstacles[closest_obs].center
+			norm = np.linalg.norm(radial)
+			# At the center every direction is radial, use the x axis
+			radial = radial / norm if norm > 0 else np.array([1.0, 0.0])
+			tangent_vector = np.array([-radial[1], radial[0]])
+			return closest_obs, dist, None, tangent_vector
+		
+		# Ties between edges are resolved in favour of the last one, as in 
+		# Polygon.compute_distance_point_to_polygon
+		edge_ids = np.flatnonzero(self.segment_owner == closest_obs)
+		i = edge_ids[len(edge_ids) - 1 - np.argmin(seg_dists[edge_ids][::-1])]
+		
+		len_polygon = len(edge_ids)
+		closest_point = self.segment_local[i]
+		if cases[i] == 2:
+			closest_point = (closest_point+1) % len_polygon
+		segment_idx = (closest_point, (closest_point+1) % len_polygon)
+		
+		v1, v2 = self.segments[edge_ids[segment_idx[0]]]
+		tangent_vector = (v2-v1)/np.linalg.norm(v2-v1)
+		
+		return closest_obs, dist, segment_idx, tangent_vector
+
+	def __compute_containment__(self, points):
+		# Returns the even-odd containment mask over all obstacles together with
+		# the clearance to the polygon edges and to the circle boundaries
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		inside = np.zeros(points.shape[0], dtype=bool)
+		polygon_clearance = np.full(points.shape[0], np.inf)
+		circle_clearance = np.full(points.shape[0], np.inf)
+		
+		if self.segments.shape[0]:
+			crossings = compute_edge_crossings(points, self.segments)
+			_, seg_dists, _ = compute_distances_points_to_segments(points, self.segments)
+			# Even-odd rule per polygon
+			starts = np.flatnonzero(np.r_[True, np.diff(self.segment_owner) != 0])
+			count = np.add.reduceat(crossings.astype(int), starts, axis=1)
+			inside |= np.any(count % 2 == 1, axis=1)
+			polygon_clearance = np.min(seg_dists, axis=1)
+		
+		if self.centers.shape[0]:
+			diff = self.centers[None, :, :] - points[:, None, :]
+			dist_sq = np.einsum('nck,nck->nc', diff, diff)
+			inside |= np.any(dist_sq <= self.radii ** 2, axis=1)
+			circle_clearance = np.min(np.abs(np.sqrt(dist_sq) - self.radii), axis=1)
+		
+		return inside, polygon_clearance, circle_clearance
 
-			dist.append(dx * dx + dy * dy)
+	def compute_points_containment(self, points):
+		"""
+		Vectorized containment test of an (N,2) array of points against all obstacles
 
-		if np.min(dist) <= self.radius ** 2:
-			return True
+		Method returns:
+		- (N,) boolean mask, True for points inside any obstacle
+		- (N,) array with the distance from each point to the closest obstacle boundary
+		"""
+		inside, polygon_clearance, circle_clearance = self.__compute_containment__(points)
+		return inside, np.minimum(polygon_clearance, circle_clearance)
 
-		return False  # safe
\ No newline at end of file
+	def compute_collision_mask(self, points, min_dist=2.5):
+		"""
+		Per-point version of is_in_collision_with_points. A point is in collision if 
+		it is inside any obstacle or closer than min_dist to a polygon edge (circles 
+		have no margin, as in Circle.is_in_collision_with_points)
+
+		Method returns an (N,) boolean mask
+		"""
+		inside, polygon_clearance, _ = self.__compute_containment__(points)
+		return inside | (polygon_clearance < min_dist)
+
+	def is_in_collision_with_points(self, points, min_dist=2.5):
+		"""
+		Equivalent to testing is_in_collision_with_points on every obstacle of the field
+		"""
+		return bool(np.any(self.compute_collision_mask(points, min_dist)))
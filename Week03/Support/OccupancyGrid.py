@@ -0,0 +1,228 @@
+import os
+import hashlib
+import numpy as np
+from scipy import ndimage
+from Obstacle import *
+
+
+class OccupancyGrid:
+	"""
+	Rasterized representation of a set of obstacles
+
+	The area [x_min, x_max] x [y_min, y_max] is divided in square cells of side
+	resolution. The grid stores:
+	- occupancy: (rows, cols) boolean array, True for cells whose center is inside an obstacle
+	- distance: (rows, cols) signed Euclidean distance from each cell center to the
+	  closest obstacle boundary (negative inside obstacles). The boundary is placed
+	  halfway between occupied and free cells, so distances are accurate to about
+	  half a cell
+
+	Rows follow the y axis and columns the x axis, so occupancy[row, col] is the cell
+	with center (x_min + (col+0.5)*resolution, y_min + (row+0.5)*resolution).
+
+	Collision and clearance queries are O(1) array lookups. Distances are
+	bilinearly interpolated between cell centers.
+
+	If cache_dir is given, the rasterized arrays are saved there as .npy files
+	named after a hash of the obstacle set and grid parameters, and loaded as
+	memory-mapped arrays the next time the same map is used.
+	"""
+
+	def __init__(self, obstacles, resolution=0.5, bounds=None, padding=5.0, cache_dir=None):
+		if bounds is None:
+			bounds = self.compute_bounds(obstacles, padding)
+		self.__set_geometry__(resolution, bounds)
+
+		self.key = self.compute_key(obstacles, self.resolution, bounds)
+		if cache_dir is not None and self.__load__(cache_dir):
+			return
+
+		self.occupancy = self.__rasterize__(obstacles)
+		self.distance = self.compute_signed_distance(self.occupancy, self.resolution)
+
+		if cache_dir is not None:
+			self.__save__(cache_dir)
+
+	@classmethod
+	def from_point_cloud(cls, obstacle_x, obstacle_y, resolution=0.5, bounds=None, padding=5.0):
+		"""
+		Builds a grid from obstacle points, such as the (ox, oy) lists used to
+		create a PRM roadmap. Every cell that contains a point is occupied
+		"""
+		points = np.vstack((obstacle_x, obstacle_y)).T.astype(float)
+		if bounds is None:
+			bounds = np.concatenate((points.min(axis=0) - padding, points.max(axis=0) + padding))
+
+		grid = cls.__new__(cls)
+		grid.__set_geometry__(resolution, bounds)
+		grid.key = hashlib.sha1(points.tobytes() + np.array(bounds, dtype=float).tobytes() +
+								np.array([resolution], dtype=float).tobytes()).hexdigest()
+
+		rows, cols = grid.point_to_cell(points)
+		valid = (rows >= 0) & (rows < grid.rows) & (cols >= 0) & (cols < grid.cols)
+		grid.occupancy = np.zeros((grid.rows, grid.cols), dtype=bool)
+		grid.occupancy[rows[valid], cols[valid]] = True
+		grid.distance = cls.compute_signed_distance(grid.occupancy, grid.resolution)
+		return grid
+
+	def __set_geometry__(self, resolution, bounds):
+		self.resolution = float(resolution)
+		self.x_min, self.y_min, self.x_max, self.y_max = [float(b) for b in bounds]
+		self.cols = int(np.ceil((self.x_max - self.x_min) / self.resolution))
+		self.rows = int(np.ceil((self.y_max - self.y_min) / self.resolution))
+
+	@staticmethod
+	def compute_bounds(obstacles, padding=5.0):
+		"""
+		Bounding box [x_min, y_min, x_max, y_max] of all obstacles grown by padding
+		"""
+		mins, maxs = [], []
+		for obs in obstacles:
+			if isinstance(obs, Circle):
+				mins.append(obs.center - obs.radius)
+				maxs.append(obs.center + obs.radius)
+			else:
+				vertices = np.asarray(obs.vertices, dtype=float)
+				mins.append(vertices.min(axis=0))
+				maxs.append(vertices.max(axis=0))
+
+		return np.concatenate((np.min(mins, axis=0) - padding, np.max(maxs, axis=0) + padding))
+
+	@staticmethod
+	def compute_key(obstacles, resolution, bounds):
+		"""
+		Hash that identifies an obstacle set rasterized with a given resolution and bounds
+		"""
+		sha = hashlib.sha1()
+		for obs in obstacles:
+			sha.update(type(obs).__name__.encode())
+			if isinstance(obs, Circle):
+				sha.update(np.array([obs.center[0], obs.center[1], obs.radius], dtype=float).tobytes())
+			else:
+				sha.update(np.ascontiguousarray(obs.vertices, dtype=float).tobytes())
+		sha.update(np.array(bounds, dtype=float).tobytes())
+		sha.update(np.array([resolution], dtype=float).tobytes())
+		return sha.hexdigest()
+
+	@staticmethod
+	def compute_signed_distance(occupancy, resolution):
+		"""
+		Signed Euclidean distance transform: positive in free space, negative inside obstacles.
+		Without any occupied cell there is no obstacle to measure from, and every cell
+		gets an infinite clearance
+
+		The distance transforms measure between cell centers. The obstacle boundary lies
+		between the centers of an occupied and a free cell, so half a cell is removed
+		from both sides: the cells next to the boundary get +-resolution/2 instead of
+		+-resolution
+		"""
+		if not np.any(occupancy):
+			return np.full(np.shape(occupancy), np.inf, dtype=np.float32)
+
+		outside = ndimage.distance_transform_edt(~occupancy) * resolution
+		inside = ndimage.distance_transform_edt(occupancy) * resolution
+		return np.where(occupancy, 0.5 * resolution - inside, outside - 0.5 * resolution).astype(np.float32)
+
+	def __rasterize__(self, obstacles, chunk_size=4096):
+		field = ObstacleField(obstacles)
+		x_centers = self.x_min + (np.arange(self.cols) + 0.5) * self.resolution
+		y_centers = self.y_min + (np.arange(self.rows) + 0.5) * self.resolution
+		xx, yy = np.meshgrid(x_centers, y_centers)
+		centers = np.vstack((xx.ravel(), yy.ravel())).T
+
+		# Process cells in chunks to bound the size of the (cells, edges) temporaries
+		occupancy = np.zeros(centers.shape[0], dtype=bool)
+		for i in range(0, centers.shape[0], chunk_size):
+			occupancy[i:i+chunk_size], _ = field.compute_points_containment(centers[i:i+chunk_size])
+
+		return occupancy.reshape(self.rows, self.cols)
+
+	def __cache_paths__(self, cache_dir):
+		return (os.path.join(cache_dir, self.key + "_occupancy.npy"),
+				os.path.join(cache_dir, self.key + "_distance.npy"))
+
+	def __load__(self, cache_dir):
+		occupancy_path, distance_path = self.__cache_paths__(cache_dir)
+		if not (os.path.exists(occupancy_path) and os.path.exists(distance_path)):
+			return False
+
+		self.occupancy = np.load(occupancy_path, mmap_mode='r')
+		self.distance = np.load(distance_path, mmap_mode='r')
+		return True
+
+	def __save__(self, cache_dir):
+		os.makedirs(cache_dir, exist_ok=True)
+		for path, array in zip(self.__cache_paths__(cache_dir), (self.occupancy, self.distance)):
+			# Write to a temporary file first so that a partially written file is never loaded
+			tmp_path = path + ".tmp.npy"
+			np.save(tmp_path, array)
+			os.replace(tmp_path, path)
+
+	def point_to_cell(self, points):
+		"""
+		Returns the (row, col) indices of the cells that contain the (N,2) points
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		cols = np.floor((points[:, 0] - self.x_min) / self.resolution).astype(int)
+		rows = np.floor((points[:, 1] - self.y_min) / self.resolution).astype(int)
+		return rows, cols
+
+	def cell_to_point(self, rows, cols):
+		"""
+		Returns the (N,2) coordinates of the centers of the given cells
+		"""
+		x = self.x_min + (np.asarray(cols) + 0.5) * self.resolution
+		y = self.y_min + (np.asarray(rows) + 0.5) * self.resolution
+		return np.vstack((x, y)).T
+
+	def is_occupied(self, points):
+		"""
+		Occupancy of the cells containing the (N,2) points. Points outside the grid are free
+		"""
+		rows, cols = self.point_to_cell(points)
+		valid = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+		occupied = np.zeros(rows.shape[0], dtype=bool)
+		occupied[valid] = self.occupancy[rows[valid], cols[valid]]
+		return occupied
+
+	def compute_distance(self, points):
+		"""
+		Signed distance from the (N,2) points to the closest obstacle, bilinearly
+		interpolated between cell centers. Points outside the grid use the closest
+		border values
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+
+		d = self.distance
+		# A grid without obstacles has an infinite clearance in every cell. Returned
+		# directly, as the interpolation would turn inf*0 into nan
+		if d.size == 0 or np.isposinf(d.flat[0]):
+			return np.full(points.shape[0], np.inf)
+
+		# Continuous cell coordinates, measured from the first cell center
+		u = (points[:, 0] - self.x_min) / self.resolution - 0.5
+		v = (points[:, 1] - self.y_min) / self.resolution - 0.5
+		u = np.clip(u, 0, self.cols - 1)
+		v = np.clip(v, 0, self.rows - 1)
+
+		c0 = np.minimum(np.floor(u).astype(int), max(self.cols - 2, 0))
+		r0 = np.minimum(np.floor(v).astype(int), max(self.rows - 2, 0))
+		c1 = np.minimum(c0 + 1, self.cols - 1)
+		r1 = np.minimum(r0 + 1, self.rows - 1)
+		du = u - c0
+		dv = v - r0
+
+		return (d[r0, c0] * (1 - du) * (1 - dv) + d[r0, c1] * du * (1 - dv) +
+				d[r1, c0] * (1 - du) * dv + d[r1, c1] * du * dv)
+
+	def compute_collision_mask(self, points, min_dist=2.5):
+		"""
+		Per-point collision test: a point is in collision if it lies in an occupied
+		cell or its interpolated clearance is below min_dist. The default min_dist is
+		the same as in ObstacleField.compute_collision_mask, but the margin applies
+		to all obstacles, circles included
+		"""
+		return self.is_occupied(points) | (self.compute_distance(points) < min_dist)
+
+	def is_in_collision_with_points(self, points, min_dist=2.5):
+		return bool(np.any(self.compute_collision_mask(points, min_dist)))
@@ -0,0 +1,683 @@
+import os
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from scipy.spatial import cKDTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from math_functions import iterate_segment_samples
+from path_search import breadth_first_search
+
+
+# States of the roadmap edges in lazy mode
+EDGE_UNCHECKED = 0
+EDGE_VALID = 1
+EDGE_INVALID = 2
+
+
+def _sorted_unique(keys):
+	# Equivalent to np.unique for 1-D integer keys, faster on large arrays
+	keys = np.sort(keys)
+	if keys.size == 0:
+		return keys
+	return keys[np.r_[True, keys[1:] != keys[:-1]]]
+
+
+class CSRRoadmap:
+	"""
+	Compressed sparse row (CSR) representation of a PRM roadmap
+
+	The neighbours of vertex i are indices[indptr[i]:indptr[i+1]] and the lengths
+	of the corresponding edges are weights[indptr[i]:indptr[i+1]].
+
+	- vertices: (N,2) array of vertex coordinates
+	- indptr: (N+1,) int32 array (int64 if there are 2^31 edges or more)
+	- indices: (E,) int32 array
+	- weights: (E,) float32 array with the edge lengths. Unless they are given, they
+	  are computed from the vertices the first time they are used (shortest paths,
+	  to_scipy, neighbours) and kept from then on
+
+	Memory for a 100k-vertex roadmap with about 11 edges per vertex: the nested
+	lists of Roadmap.edges take about 47 MB once their int objects are counted.
+	indptr and indices take 5.0 MB (about 10x less), 6.6 MB with the vertices (7x)
+	and 11.1 MB once the weights have been computed (about 4x less)
+
+	road_map.edges[i] returns the neighbours of vertex i, so this class can be
+	used wherever a roadmap with a list of lists of edges is expected (for example,
+	the search functions in path_search)
+	"""
+
+	class EdgeView:
+		"""
+		List-like, read-only view of the neighbours of every vertex
+		"""
+
+		def __init__(self, road_map):
+			self.road_map = road_map
+
+		def __len__(self):
+			return self.road_map.vertices.shape[0]
+
+		def __getitem__(self, i):
+			# Python ints are much faster than numpy scalars in the search loops
+			indptr = self.road_map.indptr
+			return self.road_map.indices[indptr[i]:indptr[i+1]].tolist()
+
+		def __iter__(self):
+			for i in range(len(self)):
+				yield self[i]
+
+	def __init__(self, vertices, indptr, indices, weights=None):
+		self.vertices = np.asarray(vertices, dtype=float)
+		indptr = np.asarray(indptr)
+		# Same index type as scipy.sparse, so that to_scipy does not copy indptr
+		index_dtype = np.int32 if indptr.size == 0 or indptr[-1] < 2**31 else np.int64
+		self.indptr = indptr.astype(index_dtype, copy=False)
+		self.indices = np.asarray(indices, dtype=np.int32)
+
+		self._weights = None if weights is None else np.asarray(weights, dtype=np.float32)
+
+		# kd-tree over the vertices, built the first time points are snapped to the roadmap
+		self.vertex_tree = None
+
+	@classmethod
+	def from_pairs(cls, vertices, sources, targets, symmetric=False):
+		"""
+		Builds a roadmap from arrays of edge end points. If symmetric is True, the
+		reverse of every edge is added too. Repeated edges are stored once
+		"""
+		vertices = np.asarray(vertices, dtype=float)
+		n_vertices = vertices.shape[0]
+		sources = np.asarray(sources, dtype=np.int64)
+		targets = np.asarray(targets, dtype=np.int64)
+
+		if symmetric:
+			sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+
+		# Sort by (source, target) and drop repeated edges
+		keys = _sorted_unique(sources * n_vertices + targets)
+		sources, targets = keys // n_vertices, keys % n_vertices
+
+		indptr = np.zeros(n_vertices + 1, dtype=np.int64)
+		np.cumsum(np.bincount(sources, minlength=n_vertices), out=indptr[1:])
+		return cls(vertices, indptr, targets)
+
+	@classmethod
+	def from_edge_lists(cls, vertices, edges):
+		"""
+		Builds a roadmap from a list where edges[i] lists the neighbours of vertex i,
+		as built by Roadmap.define_edges. The order of the neighbours is kept
+		"""
+		counts = np.array([len(e) for e in edges], dtype=np.int64)
+		indptr = np.zeros(len(edges) + 1, dtype=np.int64)
+		np.cumsum(counts, out=indptr[1:])
+		indices = np.fromiter((idx for e in edges for idx in e), dtype=np.int32, count=indptr[-1])
+		return cls(vertices, indptr, indices)
+
+	@property
+	def edges(self):
+		return self.EdgeView(self)
+
+	@property
+	def num_vertices(self):
+		return self.vertices.shape[0]
+
+	@property
+	def weights(self):
+		if self._weights is None:
+			rows = np.repeat(np.arange(self.vertices.shape[0]), np.diff(self.indptr))
+			diff = self.vertices[self.indices] - self.vertices[rows]
+			self._weights = np.hypot(diff[:, 0], diff[:, 1]).astype(np.float32)
+		return self._weights
+
+	@property
+	def num_edges(self):
+		return self.indices.shape[0]
+
+	@property
+	def nbytes(self):
+		"""Memory used by the roadmap arrays, in bytes (weights only once they are computed)"""
+		weights_nbytes = 0 if self._weights is None else self._weights.nbytes
+		return self.vertices.nbytes + self.indptr.nbytes + self.indices.nbytes + weights_nbytes
+
+	def neighbours(self, i):
+		"""
+		Returns the indices of the neighbours of vertex i and the length of the edges to them
+		"""
+		start, end = self.indptr[i], self.indptr[i+1]
+		return self.indices[start:end], self.weights[start:end]
+
+	def save(self, path):
+		"""
+		Saves the roadmap arrays to an uncompressed .npz file. The weights are not
+		saved, they are computed again when needed
+		"""
+		# Write to a temporary file first so that a partially written file is never loaded
+		tmp_path = path + ".tmp.npz"
+		np.savez(tmp_path, vertices=self.vertices, indptr=self.indptr, indices=self.indices)
+		os.replace(tmp_path, path)
+
+	@classmethod
+	def load(cls, path):
+		with np.load(path) as data:
+			weights = data['weights'] if 'weights' in data.files else None
+			return cls(data['vertices'], data['indptr'], data['indices'], weights)
+
+	def to_edge_lists(self):
+		"""
+		Returns the edges as a list of lists, the format used by Roadmap.edges
+		"""
+		return [self.indices[self.indptr[i]:self.indptr[i+1]].tolist() for i in range(self.num_vertices)]
+
+	def to_scipy(self):
+		"""
+		Returns the roadmap as a (N,N) scipy.sparse.csr_matrix weighted by edge length.
+		The matrix shares indptr, indices and weights with the roadmap
+		"""
+		return csr_matrix((self.weights, self.indices, self.indptr), shape=(self.num_vertices, self.num_vertices))
+
+	def snap(self, points):
+		"""
+		Returns the indices of the vertices closest to the (K,2) points, found with a
+		single kd-tree query
+		"""
+		if self.vertex_tree is None:
+			self.vertex_tree = cKDTree(self.vertices)
+		_, idx = self.vertex_tree.query(np.asarray(points, dtype=float).reshape(-1, 2))
+		return np.asarray(idx, dtype=np.int64)
+
+	def shortest_path(self, start, goal):
+		"""
+		Shortest path between start and goal using scipy.sparse.csgraph.dijkstra.
+		As with the search functions in path_search, the path goes from goal to
+		start, or False is returned if there is no path
+		"""
+		return self.shortest_paths([start], [goal])[0]
+
+	def shortest_paths(self, starts, goals, chunk_size=256):
+		"""
+		Answers many queries at once: starts[k] and goals[k] are the (K,2) end points
+		of query k. All points are snapped to the roadmap with one kd-tree query and
+		one single-source dijkstra search is run per distinct start vertex (or per
+		distinct goal vertex over the reversed roadmap, if there are fewer of them),
+		so queries that share an end point share the search. Searches are run
+		chunk_size sources at a time to bound the size of the (sources, N) results
+
+		Method returns a list with the path of every query, in the format of
+		shortest_path
+		"""
+		starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+		goals = np.asarray(goals, dtype=float).reshape(-1, 2)
+		snapped = self.snap(np.vstack((starts, goals)))
+		idx_starts, idx_goals = snapped[:len(starts)], snapped[len(starts):]
+
+		graph = self.to_scipy()
+		from_goal = len(np.unique(idx_goals)) < len(np.unique(idx_starts))
+		if from_goal:
+			sources, targets, graph = idx_goals, idx_starts, graph.T
+		else:
+			sources, targets = idx_starts, idx_goals
+
+		unique_sources, inverse = np.unique(sources, return_inverse=True)
+		paths = [False] * len(starts)
+		for first in range(0, len(unique_sources), chunk_size):
+			dist, predecessors = dijkstra(graph, indices=unique_sources[first:first+chunk_size],
+										  return_predecessors=True)
+
+			for k in np.flatnonzero((inverse >= first) & (inverse < first + chunk_size)):
+				row = inverse[k] - first
+				if np.isinf(dist[row, targets[k]]):
+					continue
+
+				# Walk the predecessors from the target back to the source
+				chain = []
+				idx = targets[k]
+				while idx >= 0:
+					chain.append(idx)
+					idx = predecessors[row, idx]
+				if from_goal:
+					chain.reverse()
+
+				paths[k] = [goals[k].copy()] + list(self.vertices[chain]) + [starts[k].copy()]
+
+		return paths
+
+
+def sample_free_space(obstacles, width, height, num_samples=100, robot_radius=5, batch_size=None):
+	"""
+	Vectorized version of Roadmap.generate_samples. Points are drawn uniformly in
+	[0, width] x [0, height] in batches and the ones closer than robot_radius to an
+	obstacle point (obstacles is a cKDTree) are discarded.
+
+	Points are drawn from np.random in the same order as the one-at-a-time loop,
+	so the accepted samples are the same. Only the number of discarded draws
+	after the last accepted sample can differ
+	"""
+	if batch_size is None:
+		batch_size = max(num_samples, 64)
+
+	accepted = []
+	n_accepted = 0
+	while n_accepted < num_samples:
+		points = np.random.random_sample((batch_size, 2)) * np.array([width, height])
+		dist, _ = obstacles.query(points, distance_upper_bound=robot_radius)
+		points = points[dist >= robot_radius]
+		accepted.append(points)
+		n_accepted += points.shape[0]
+
+	return np.concatenate(accepted, axis=0)[:num_samples]
+
+
+def compute_candidate_edges(vertices, distance_threshold=10.0, num_neighbors=10):
+	"""
+	Finds, with a single kd-tree query for all vertices, the candidate edges of the
+	roadmap: the union-symmetrised kNN graph. A pair (i,j) is a candidate if j is
+	among the num_neighbors nearest neighbours of i or i is among those of j (not
+	necessarily both), and the two vertices are closer than distance_threshold.
+	Each pair (i,j) is returned once, with i < j.
+
+	Roadmap.define_edges only keeps the directed edges i->j with j among the
+	neighbours of i, so this is a superset of its edges (with the reverse edges added)
+	"""
+	vertices = np.asarray(vertices, dtype=float)
+	n_vertices = vertices.shape[0]
+
+	_, indexes = cKDTree(vertices).query(vertices, k=num_neighbors, distance_upper_bound=distance_threshold)
+	indexes = np.asarray(indexes).reshape(n_vertices, -1)
+
+	# As in Roadmap.define_edges, the first neighbour is the vertex itself. kd-tree
+	# returns n_vertices as index when there are less than k neighbours
+	sources = np.repeat(np.arange(n_vertices), indexes.shape[1] - 1)
+	targets = indexes[:, 1:].ravel()
+	valid = (targets < n_vertices) & (targets != sources)
+	sources, targets = sources[valid], targets[valid]
+
+	# Drop the symmetric duplicates
+	keys = _sorted_unique(np.minimum(sources, targets) * n_vertices + np.maximum(sources, targets))
+	return keys // n_vertices, keys % n_vertices
+
+
+def check_segments_collision(obstacles, starts, ends, robot_radius, chunk_size=200000):
+	"""
+	Batched version of Roadmap.is_there_collision. Every segment is sampled every
+	robot_radius from its start, as in the one-segment version, and all samples are
+	checked against the obstacle kd-tree in one query.
+
+	Method returns an (M,) boolean array, True for segments in collision
+	"""
+	starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+	ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+	n_segments = starts.shape[0]
+
+	delta = ends - starts
+	n_steps = np.round(np.hypot(delta[:, 0], delta[:, 1]) / robot_radius).astype(np.int64)
+
+	in_collision = np.zeros(n_segments, dtype=bool)
+	for owner, samples in iterate_segment_samples(starts, ends, n_steps, step=robot_radius, chunk_size=chunk_size):
+		dist, _ = obstacles.query(samples, distance_upper_bound=robot_radius)
+		in_collision[owner[dist < robot_radius]] = True
+
+	return in_collision
+
+
+# Per-process state of the collision check workers
+_worker_state = {}
+
+
+def _init_collision_worker(obstacles_name, obstacles_shape, vertices_name, vertices_shape):
+	# Attach to the shared obstacle points and vertices, and build the obstacle
+	# kd-tree once per worker process
+	obstacles_shm = shared_memory.SharedMemory(name=obstacles_name)
+	vertices_shm = shared_memory.SharedMemory(name=vertices_name)
+	obstacle_points = np.ndarray(obstacles_shape, dtype=np.float64, buffer=obstacles_shm.buf)
+
+	_worker_state['shm'] = (obstacles_shm, vertices_shm)
+	_worker_state['obstacles'] = cKDTree(obstacle_points)
+	_worker_state['vertices'] = np.ndarray(vertices_shape, dtype=np.float64, buffer=vertices_shm.buf)
+
+
+def _check_collision_shard(sources, targets, robot_radius):
+	vertices = _worker_state['vertices']
+	return check_segments_collision(_worker_state['obstacles'], vertices[sources],
+									vertices[targets], robot_radius)
+
+
+def _to_shared_memory(array):
+	array = np.ascontiguousarray(array, dtype=np.float64)
+	shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+	np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf)[...] = array
+	return shm
+
+
+def check_edges_collision_parallel(obstacles, vertices, sources, targets, robot_radius,
+								   workers=None, shards_per_worker=4):
+	"""
+	Same result as check_segments_collision(obstacles, vertices[sources], vertices[targets], robot_radius),
+	with the edges sharded by source vertex range across a ProcessPoolExecutor.
+
+	The obstacle points (obstacles.data) and the vertices are placed in shared
+	memory, so each worker only receives the edge indices of its shard and builds
+	its own read-only copy of the obstacle kd-tree. sources must be sorted, as
+	returned by compute_candidate_edges. The collision check is deterministic, so
+	the merged result does not depend on the number of workers
+	"""
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	vertices = np.asarray(vertices, dtype=float)
+	sources = np.asarray(sources, dtype=np.int64)
+	targets = np.asarray(targets, dtype=np.int64)
+
+	# Contiguous vertex ranges, mapped to the edges that start in them
+	n_shards = max(workers * shards_per_worker, 1)
+	vertex_bounds = np.linspace(0, vertices.shape[0], n_shards + 1).astype(np.int64)
+	edge_bounds = np.searchsorted(sources, vertex_bounds)
+
+	obstacles_shm = _to_shared_memory(obstacles.data)
+	vertices_shm = _to_shared_memory(vertices)
+	try:
+		with ProcessPoolExecutor(max_workers=workers, initializer=_init_collision_worker,
+								 initargs=(obstacles_shm.name, obstacles.data.shape,
+										   vertices_shm.name, vertices.shape)) as executor:
+			futures = [executor.submit(_check_collision_shard, sources[lo:hi], targets[lo:hi], robot_radius)
+					   for lo, hi in zip(edge_bounds[:-1], edge_bounds[1:]) if hi > lo]
+			results = [f.result() for f in futures]
+	finally:
+		obstacles_shm.close()
+		obstacles_shm.unlink()
+		vertices_shm.close()
+		vertices_shm.unlink()
+
+	if not results:
+		return np.zeros(0, dtype=bool)
+	return np.concatenate(results)
+
+
+class PRMPlanner:
+	"""
+	PRM planner with the same interface as the Roadmap class of the PRM practical,
+	where samples are drawn in batches and the roadmap edges are built in bulk:
+	one kd-tree query for all vertices, symmetric candidate edges checked once and
+	all collision checks done in batched kd-tree queries.
+
+	With workers > 1, the edge collision checks are split across processes.
+	Samples are always drawn in the main process, so serial and parallel builds
+	with the same seed produce identical roadmaps.
+
+	If cache_dir is given, built roadmaps are saved there in files named after a
+	hash of the obstacle points and the roadmap parameters. The next planner
+	created for the same map and parameters loads the file the first time a
+	roadmap is needed instead of building it again.
+
+	The roadmap is stored as a CSRRoadmap in self.road_map
+
+	With lazy=True, define_edges only connects neighbouring vertices and does not
+	check the edges for collision. Every edge has a state in self.edge_state
+	(EDGE_UNCHECKED, EDGE_VALID or EDGE_INVALID). Queries search for the shortest
+	path over the edges not known to be invalid, check the unchecked edges on it
+	and search again if any of them is in collision. Edge states are kept across
+	queries, so the roadmap gets cheaper to use as more of it is checked.
+	self.num_edge_checks counts the edges checked so far
+	"""
+
+	def __init__(self, obstacle_x, obstacle_y, workers=1, cache_dir=None, lazy=False):
+		# We use a kdtree structure to speed up nearest-neighbour lookup
+		self.obstacles = cKDTree(np.vstack((obstacle_x, obstacle_y)).T)
+		self.width = np.max(np.array(obstacle_x))
+		self.height = np.max(np.array(obstacle_y))
+
+		self.vertices = np.zeros((0, 2))
+		self.road_map = None
+		self.workers = workers
+		self.cache_dir = cache_dir
+
+		self.lazy = lazy
+		self.robot_radius = None
+		self.edge_state = None
+		self.num_edge_checks = 0
+
+		self.is_built = False
+
+	@property
+	def edges(self):
+		return self.road_map.edges
+
+	def generate_samples(self, num_samples=100, robot_radius=5):
+		self.vertices = sample_free_space(self.obstacles, self.width, self.height,
+										  num_samples=num_samples, robot_radius=robot_radius)
+
+	def define_edges(self, robot_radius=5, distance_threshold=10.0, num_neighbors=10):
+		"""
+		Two vertices are connected if one is among the num_neighbors closest to the
+		other, they are closer than distance_threshold and the segment between
+		them is collision free. Edges are stored in both directions
+
+		In lazy mode, the collision checks are deferred until a query uses the edge
+		"""
+		self.robot_radius = robot_radius
+		sources, targets = compute_candidate_edges(self.vertices, distance_threshold, num_neighbors)
+		if self.lazy:
+			self.road_map = CSRRoadmap.from_pairs(self.vertices, sources, targets, symmetric=True)
+			self.__reset_edge_states__()
+			return
+
+		if self.workers > 1:
+			in_collision = check_edges_collision_parallel(self.obstacles, self.vertices, sources, targets,
+														  robot_radius, workers=self.workers)
+		else:
+			in_collision = check_segments_collision(self.obstacles, self.vertices[sources],
+													self.vertices[targets], robot_radius)
+
+		self.road_map = CSRRoadmap.from_pairs(self.vertices, sources[~in_collision],
+											  targets[~in_collision], symmetric=True)
+
+	def compute_cache_key(self, num_samples=100, max_distance=10, max_neighbours=10, robot_size=2.5):
+		"""
+		Hash of the obstacle points and the parameters that define a roadmap
+		"""
+		sha = hashlib.sha1(np.ascontiguousarray(self.obstacles.data, dtype=np.float64).tobytes())
+		sha.update(np.array([num_samples, max_distance, max_neighbours, robot_size], dtype=np.float64).tobytes())
+		if self.lazy:
+			# Lazy roadmaps keep the edges that have not been checked
+			sha.update(b"lazy")
+		return sha.hexdigest()
+
+	def __cache_path__(self, num_samples, max_distance, max_neighbours, robot_size):
+		key = self.compute_cache_key(num_samples, max_distance, max_neighbours, robot_size)
+		return os.path.join(self.cache_dir, "roadmap_" + key + ".npz")
+
+	def __generate_roadmap__(self, num_samples=100, max_distance=10, max_neighbours=10, robot_size=2.5):
+		if self.is_built:
+			return
+
+		cache_path = None
+		if self.cache_dir is not None:
+			cache_path = self.__cache_path__(num_samples, max_distance, max_neighbours, robot_size)
+			if os.path.exists(cache_path):
+				self.road_map = CSRRoadmap.load(cache_path)
+				self.vertices = self.road_map.vertices
+				self.robot_radius = robot_size
+				if self.lazy:
+					self.__reset_edge_states__()
+				self.is_built = True
+				return
+
+		self.generate_samples(num_samples=num_samples, robot_radius=robot_size)
+		self.define_edges(robot_radius=robot_size, distance_threshold=max_distance,
+						  num_neighbors=max_neighbours)
+		self.is_built = True
+
+		if cache_path is not None:
+			os.makedirs(self.cache_dir, exist_ok=True)
+			self.road_map.save(cache_path)
+
+	def build_roadmap(self, num_samples=100, max_distance=10, max_neighbours=10, robot_size=2.5):
+		self.__generate_roadmap__(num_samples, max_distance, max_neighbours, robot_size)
+		return self.road_map
+
+	def __reset_edge_states__(self):
+		road_map = self.road_map
+		n_vertices = road_map.num_vertices
+		self.edge_state = np.full(road_map.num_edges, EDGE_UNCHECKED, dtype=np.int8)
+
+		# Edges are sorted by (source, target), so the position of an edge is found
+		# by binary search on its key. reverse_edge[e] is the position of the edge
+		# in the opposite direction, which shares the state of e
+		self.edge_sources = np.repeat(np.arange(n_vertices, dtype=np.int64), np.diff(road_map.indptr))
+		self.edge_keys = self.edge_sources * n_vertices + road_map.indices
+		self.reverse_edge = np.searchsorted(self.edge_keys, road_map.indices.astype(np.int64) * n_vertices + self.edge_sources)
+
+	def __plan_lazy__(self, start, goal):
+		road_map = self.road_map
+		n_vertices = road_map.num_vertices
+		idx_start, idx_goal = road_map.snap([start, goal])
+
+		while True:
+			# Search over the edges that are not known to be in collision
+			usable = self.edge_state != EDGE_INVALID
+			indptr = np.zeros(n_vertices + 1, dtype=np.int64)
+			np.cumsum(np.bincount(self.edge_sources[usable], minlength=n_vertices), out=indptr[1:])
+			graph = csr_matrix((road_map.weights[usable], road_map.indices[usable], indptr),
+							   shape=(n_vertices, n_vertices))
+
+			dist, predecessors = dijkstra(graph, indices=idx_start, return_predecessors=True)
+			if np.isinf(dist[idx_goal]):
+				return False
+
+			chain = [idx_goal]
+			while predecessors[chain[-1]] >= 0:
+				chain.append(predecessors[chain[-1]])
+			chain = np.array(chain, dtype=np.int64)
+
+			# Check the unchecked edges of the candidate path in one batch
+			path_edges = np.searchsorted(self.edge_keys, chain[1:] * n_vertices + chain[:-1])
+			unchecked = path_edges[self.edge_state[path_edges] == EDGE_UNCHECKED]
+			if unchecked.size:
+				# Edges are checked from the lower to the higher vertex index, as in define_edges
+				ends = np.sort(np.vstack((self.edge_sources[unchecked], road_map.indices[unchecked])), axis=0)
+				in_collision = check_segments_collision(self.obstacles, road_map.vertices[ends[0]],
+														road_map.vertices[ends[1]], self.robot_radius)
+				state = np.where(in_collision, EDGE_INVALID, EDGE_VALID).astype(np.int8)
+				self.edge_state[unchecked] = state
+				self.edge_state[self.reverse_edge[unchecked]] = state
+				self.num_edge_checks += unchecked.size
+
+				if np.any(in_collision):
+					continue
+
+			return [np.array([goal[0], goal[1]])] + list(road_map.vertices[chain]) + [np.array([start[0], start[1]])]
+
+	def plan(self, start, goal, search=breadth_first_search):
+		"""
+		Finds a path between start and goal with one of the path_search functions.
+		The path goes from goal to start, as in Roadmap.plan
+
+		In lazy mode, the shortest path over the validated edges is returned and
+		search is not used
+		"""
+		# Generate roadmap if needed
+		self.__generate_roadmap__()
+
+		if self.lazy:
+			path = self.__plan_lazy__(start, goal)
+		else:
+			path = search(self.road_map, start, goal)
+
+		if path is False:
+			print("There is no path")
+
+		return path
+
+	def plan_many(self, starts, goals):
+		"""
+		Shortest paths for a batch of queries on the shared roadmap, see
+		CSRRoadmap.shortest_paths. Queries with no path get False
+
+		In lazy mode, queries are answered one after the other
+		"""
+		self.__generate_roadmap__()
+		if self.lazy:
+			return [self.__plan_lazy__(start, goal) for start, goal in zip(starts, goals)]
+		return self.road_map.shortest_paths(starts, goals)
+
+
+def _init_planning_worker(vertices, indptr, indices, weights):
+	_worker_state['road_map'] = CSRRoadmap(vertices, indptr, indices, weights)
+
+
+def _plan_one(start, goal):
+	return _worker_state['road_map'].shortest_path(start, goal)
+
+
+def _plan_batch(starts, goals):
+	return _worker_state['road_map'].shortest_paths(starts, goals)
+
+
+class PlanningService:
+	"""
+	Front-end for concurrent callers that query the same roadmap
+
+	Queries are answered by a pool of workers. With use_processes=False, threads
+	share the roadmap in memory; with use_processes=True every worker process
+	receives a copy of the roadmap arrays once, when it starts.
+
+	submit returns a concurrent.futures.Future with the path of one query.
+	plan_many sorts a batch of queries by start vertex and splits it into chunks
+	of batch_size queries, so queries with the same start share a search.
+	"""
+
+	def __init__(self, road_map, workers=4, use_processes=False, batch_size=64):
+		self.road_map = road_map
+		self.batch_size = batch_size
+		self.use_processes = use_processes
+
+		if use_processes:
+			self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_planning_worker,
+												initargs=(road_map.vertices, road_map.indptr,
+														  road_map.indices, road_map.weights))
+		else:
+			self.executor = ThreadPoolExecutor(max_workers=workers)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.executor.shutdown()
+
+	def __submit_batch__(self, starts, goals):
+		if self.use_processes:
+			return self.executor.submit(_plan_batch, starts, goals)
+		return self.executor.submit(self.road_map.shortest_paths, starts, goals)
+
+	def submit(self, start, goal):
+		"""
+		Schedules one query. The result of the future is the path, or False
+		"""
+		if self.use_processes:
+			return self.executor.submit(_plan_one, start, goal)
+		return self.executor.submit(self.road_map.shortest_path, start, goal)
+
+	def plan_many(self, starts, goals):
+		"""
+		Answers a batch of queries with all the workers. Method returns the list of
+		paths, in the order of the queries
+		"""
+		starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+		goals = np.asarray(goals, dtype=float).reshape(-1, 2)
+		order = np.argsort(self.road_map.snap(starts), kind='stable')
+
+		futures = []
+		for first in range(0, len(order), self.batch_size):
+			batch = order[first:first+self.batch_size]
+			futures.append((batch, self.__submit_batch__(starts[batch], goals[batch])))
+
+		paths = [False] * len(order)
+		for batch, future in futures:
+			for k, path in zip(batch, future.result()):
+				paths[k] = path
+		return paths
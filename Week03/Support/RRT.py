@@ -0,0 +1,820 @@
+# This is an adapted version of the RRT implementation done by Atsushi Sakai (@Atsushi_twi)
+
+import math
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy.spatial import cKDTree
+
+from Obstacle import *
+
+
+class NearestNeighbourIndex:
+	"""
+	Incremental nearest-neighbour index for a growing set of 2D points
+
+	Points are stored in a growable (capacity,2) array. The first n_indexed points
+	are covered by a cKDTree and the points added after the last rebuild are kept
+	in a small buffer that is scanned linearly. When the buffer grows past
+	rebuild_fraction of the indexed points (and at least min_buffer points), the
+	kd-tree is rebuilt. Each query therefore costs O(log n) plus a short linear
+	scan, and rebuilds have an amortised cost of O(log n) per insertion.
+	"""
+
+	def __init__(self, capacity=256, min_buffer=64, rebuild_fraction=0.25):
+		self.points = np.zeros((capacity, 2))
+		self.size = 0
+		self.tree = None
+		self.n_indexed = 0
+		self.min_buffer = min_buffer
+		self.rebuild_fraction = rebuild_fraction
+
+	def __len__(self):
+		return self.size
+
+	def add(self, point):
+		"""
+		Adds a point and returns its index
+		"""
+		if self.size == self.points.shape[0]:
+			grown = np.zeros((2 * self.points.shape[0], 2))
+			grown[:self.size] = self.points[:self.size]
+			self.points = grown
+
+		self.points[self.size] = point
+		self.size += 1
+
+		if self.size - self.n_indexed > max(self.min_buffer, self.rebuild_fraction * self.n_indexed):
+			self.rebuild()
+
+		return self.size - 1
+
+	def rebuild(self):
+		self.tree = cKDTree(self.points[:self.size])
+		self.n_indexed = self.size
+
+	def nearest(self, point):
+		"""
+		Returns the index of the point closest to point and the distance to it
+		"""
+		best_idx, best_dist = -1, np.inf
+		if self.tree is not None:
+			best_dist, best_idx = self.tree.query(point)
+
+		if self.size > self.n_indexed:
+			buffer = self.points[self.n_indexed:self.size]
+			dist = np.hypot(buffer[:, 0] - point[0], buffer[:, 1] - point[1])
+			i = int(np.argmin(dist))
+			if dist[i] < best_dist:
+				best_idx, best_dist = self.n_indexed + i, dist[i]
+
+		return int(best_idx), float(best_dist)
+
+	def nearest_many(self, points):
+		"""
+		Vectorized nearest-neighbour query for an (K,2) array of points
+
+		Method returns the (K,) indices of the closest points and the distances to them
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		best_idx = np.full(points.shape[0], -1, dtype=np.int64)
+		best_dist = np.full(points.shape[0], np.inf)
+		if self.tree is not None:
+			best_dist, best_idx = self.tree.query(points)
+
+		if self.size > self.n_indexed:
+			buffer = self.points[self.n_indexed:self.size]
+			diff = points[:, None, :] - buffer[None, :, :]
+			dist = np.hypot(diff[:, :, 0], diff[:, :, 1])
+			i = np.argmin(dist, axis=1)
+			buffer_dist = dist[np.arange(points.shape[0]), i]
+			closer = buffer_dist < best_dist
+			best_idx = np.where(closer, self.n_indexed + i, best_idx)
+			best_dist = np.where(closer, buffer_dist, best_dist)
+
+		return best_idx, best_dist
+
+	def query_radius(self, point, radius):
+		"""
+		Returns the indices of all points within radius of point
+		"""
+		neighbours = []
+		if self.tree is not None:
+			neighbours = self.tree.query_ball_point(point, radius)
+
+		if self.size > self.n_indexed:
+			buffer = self.points[self.n_indexed:self.size]
+			dist = np.hypot(buffer[:, 0] - point[0], buffer[:, 1] - point[1])
+			neighbours = list(neighbours) + (self.n_indexed + np.flatnonzero(dist <= radius)).tolist()
+
+		return np.array(neighbours, dtype=np.int64)
+
+
+class RRTTree:
+	"""
+	Array-backed RRT tree
+
+	- coordinates of the nodes, kept in a NearestNeighbourIndex (a growable (capacity,2) array)
+	- parents: int32 array with the index of the parent of each node (-1 for the root)
+	- costs: cumulative path length from the root to each node
+
+	The intermediate points of the steered edges are only stored when
+	keep_edge_paths is True (for plotting), in a dict indexed by node. Path
+	extraction is a walk over the parent indices.
+
+	Trees that are rewired (RRT*) set track_children to True, so that cost
+	changes can be propagated to the descendants of a rewired node
+	"""
+
+	def __init__(self, root, capacity=256, keep_edge_paths=False, track_children=False):
+		self.index = NearestNeighbourIndex(capacity=capacity)
+		self.parents = np.zeros(capacity, dtype=np.int32)
+		self.costs = np.zeros(capacity)
+		self.keep_edge_paths = keep_edge_paths
+		self.edge_paths = {}
+		self.children = [] if track_children else None
+
+		self.add(root, parent=-1)
+
+	def __len__(self):
+		return len(self.index)
+
+	@property
+	def coordinates(self):
+		return self.index.points[:len(self.index)]
+
+	@property
+	def nbytes(self):
+		"""Memory used by the node arrays, in bytes"""
+		return self.index.points.nbytes + self.parents.nbytes + self.costs.nbytes
+
+	def add(self, point, parent, edge_path=None):
+		"""
+		Adds a node at point, connected to the node with index parent, and returns its index
+		"""
+		idx = self.index.add(point)
+		if idx == self.parents.shape[0]:
+			self.parents = np.concatenate((self.parents, np.zeros_like(self.parents)))
+			self.costs = np.concatenate((self.costs, np.zeros_like(self.costs)))
+
+		self.parents[idx] = parent
+		if parent >= 0:
+			self.costs[idx] = self.costs[parent] + self.distance(parent, idx)
+
+		if self.children is not None:
+			self.children.append([])
+			if parent >= 0:
+				self.children[parent].append(idx)
+
+		if self.keep_edge_paths and edge_path is not None:
+			self.edge_paths[idx] = edge_path
+
+		return idx
+
+	def distance(self, i, j):
+		p_i, p_j = self.index.points[i], self.index.points[j]
+		return math.hypot(p_j[0] - p_i[0], p_j[1] - p_i[1])
+
+	def rewire(self, idx, new_parent, edge_path=None):
+		"""
+		Changes the parent of node idx and updates the cost of all its descendants
+		"""
+		old_parent = self.parents[idx]
+		self.children[old_parent].remove(idx)
+		self.children[new_parent].append(idx)
+		self.parents[idx] = new_parent
+
+		if self.keep_edge_paths and edge_path is not None:
+			self.edge_paths[idx] = edge_path
+
+		delta = self.costs[new_parent] + self.distance(new_parent, idx) - self.costs[idx]
+		stack = [idx]
+		while stack:
+			node = stack.pop()
+			self.costs[node] += delta
+			stack.extend(self.children[node])
+
+	def path_to_root(self, idx):
+		"""
+		Returns the (K,2) coordinates of the nodes from idx back to the root
+		"""
+		indices = []
+		while idx != -1:
+			indices.append(idx)
+			idx = self.parents[idx]
+		return self.index.points[indices]
+
+
+class RRT:
+	"""
+	Class for RRT planning, with the same interface as the RRT class of the RRT
+	practical. The tree is an RRTTree, so finding the node to expand costs
+	O(log n) instead of a scan over the whole tree and nodes are stored as array
+	rows instead of Node objects. Node objects are only created for the nodes
+	being steered.
+
+	Set keep_edge_paths to True to keep the steered edges for draw_graph
+	"""
+
+	class Node:
+		"""
+		RRT Node
+		"""
+
+		def __init__(self, x, y):
+			self.x = x
+			self.y = y
+			self.path_x = []
+			self.path_y = []
+			self.parent = None
+
+	def __init__(self, start=np.zeros(2),
+				 goal=np.array([120,90]),
+				 obstacle_list=None,
+				 width = 160,
+				 height=100,
+				 expand_dis=3.0,
+				 path_resolution=0.5,
+				 max_points=200,
+				 keep_edge_paths=False):
+		"""
+		Setting Parameter
+		start:Start Position [x,y]
+		goal:Goal Position [x,y]
+		obstacle_list: list of obstacle objects
+		width, height: search area
+		expand_dis: min distance between random node and closest node in rrt to it
+		path_resolion: step size to considered when looking for node to expand
+		"""
+		self.start = self.Node(start[0], start[1])
+		self.end = self.Node(goal[0], goal[1])
+		self.width = width
+		self.height = height
+		self.expand_dis = expand_dis
+		self.path_resolution = path_resolution
+		self.max_nodes = max_points
+		self.obstacle_list = obstacle_list
+		self.keep_edge_paths = keep_edge_paths
+		self.tree = RRTTree((self.start.x, self.start.y), keep_edge_paths=keep_edge_paths)
+		# Number of sampling iterations used by the last call to planning
+		self.iterations = 0
+
+	def get_node(self, idx):
+		"""
+		Returns a Node with the coordinates of node idx of the tree
+		"""
+		x, y = self.tree.coordinates[idx]
+		return self.Node(x, y)
+
+	def add_node(self, node, parent_ind):
+		edge_path = (node.path_x, node.path_y) if self.keep_edge_paths else None
+		return self.tree.add((node.x, node.y), parent_ind, edge_path)
+
+	def planning(self, animation=True):
+		"""
+		rrt path planning
+
+		animation: accepted for compatibility with the practical and ignored
+		"""
+		self.tree = RRTTree((self.start.x, self.start.y), keep_edge_paths=self.keep_edge_paths)
+		self.iterations = 0
+
+		while len(self.tree) <= self.max_nodes:
+			self.iterations += 1
+
+			# 1. Generate a random node
+			rnd_node = self.get_random_node()
+
+			# 2. Find node in tree that is closest to sampled node.
+			# This is the node to be expanded (q_expansion)
+			expansion_ind = self.get_nearest_node_index(None, rnd_node)
+			expansion_node = self.get_node(expansion_ind)
+
+			# 3. Select a node (nearby_node) close to expansion_node by moving from expantion_node to rnd_node
+			new_node = self.steer(expansion_node, rnd_node, self.expand_dis)
+
+			# 4. Check if nearby_node is in free space. If collision free, add it to the tree
+			if self.is_collision_free(new_node):
+				self.add_node(new_node, expansion_ind)
+
+			# If we are close to goal, stop expansion and generate path
+			last_ind = len(self.tree) - 1
+			last_node = self.get_node(last_ind)
+			if self.calc_dist_to_goal(last_node.x, last_node.y) <= self.expand_dis:
+				final_node = self.steer(last_node, self.end, self.expand_dis)
+				if self.is_collision_free(final_node):
+					return self.generate_final_course(last_ind)
+
+		return None  # cannot find path
+
+	def planning_batched(self, batch_size=32):
+		"""
+		rrt path planning with batched expansions
+
+		Every iteration draws batch_size random nodes, finds their closest nodes in
+		the tree with a single query, steers all of them with array operations and
+		collision checks every intermediate position with one vectorized obstacle
+		query. Nodes added during a batch are not considered as expansion nodes
+		until the next batch, so the tree differs from the one grown by planning.
+
+		self.iterations counts random samples, as in planning
+		"""
+		self.tree = RRTTree((self.start.x, self.start.y), keep_edge_paths=self.keep_edge_paths)
+		self.iterations = 0
+		checkers = self.get_collision_checkers()
+
+		while len(self.tree) <= self.max_nodes:
+			rnd = np.random.random_sample((batch_size, 2)) * np.array([self.width, self.height])
+			expansion_inds, _ = self.tree.index.nearest_many(rnd)
+			new_points, paths, valid = self.steer_many(self.tree.coordinates[expansion_inds], rnd, self.expand_dis)
+
+			# One collision query for the intermediate positions of all the extensions
+			collision = np.zeros(valid.shape, dtype=bool)
+			for checker in checkers:
+				collision[valid] |= checker(paths[valid])
+			free = ~np.any(collision, axis=1)
+
+			for k in range(batch_size):
+				self.iterations += 1
+				if not free[k]:
+					continue
+
+				edge_path = tuple(paths[k][valid[k]].T.tolist()) if self.keep_edge_paths else None
+				last_ind = self.tree.add(new_points[k], expansion_inds[k], edge_path)
+
+				# If we are close to goal, stop expansion and generate path
+				last_node = self.get_node(last_ind)
+				if self.calc_dist_to_goal(last_node.x, last_node.y) <= self.expand_dis:
+					final_node = self.steer(last_node, self.end, self.expand_dis)
+					if self.is_collision_free(final_node):
+						return self.generate_final_course(last_ind)
+
+				if len(self.tree) > self.max_nodes:
+					break
+
+		return None  # cannot find path
+
+	def steer_many(self, from_points, to_points, extend_length=float("inf")):
+		"""
+		Vectorized version of steer for (K,2) arrays of from and to positions
+
+		Method returns:
+		- new_points: (K,2) positions reached from every from_point
+		- paths: (K,P,2) intermediate positions, padded up to the longest extension
+		- valid: (K,P) boolean mask of the entries of paths that belong to each extension
+		"""
+		delta = to_points - from_points
+		d = np.hypot(delta[:, 0], delta[:, 1])
+		theta = np.arctan2(delta[:, 1], delta[:, 0])
+		step = self.path_resolution * np.vstack((np.cos(theta), np.sin(theta))).T
+
+		# How many intermediate positions are considered for every extension
+		n_expand = np.floor(np.minimum(d, extend_length) / self.path_resolution).astype(int)
+		n_max = int(n_expand.max()) if n_expand.size else 0
+
+		# Positions from_point + j*step, j = 0..n_expand, and to_point if it is close enough
+		j = np.arange(n_max + 2)
+		paths = from_points[:, None, :] + j[None, :, None] * step[:, None, :]
+		new_points = paths[np.arange(len(n_expand)), n_expand]
+		valid = j[None, :] <= n_expand[:, None]
+
+		remaining = np.hypot(*(to_points - new_points).T)
+		close = remaining <= self.path_resolution
+		paths[close, n_expand[close] + 1] = to_points[close]
+		valid[close, n_expand[close] + 1] = True
+
+		return new_points, paths, valid
+
+	def get_collision_checkers(self):
+		"""
+		Per-point collision functions for the obstacle list. Polygons and circles
+		are merged in a single ObstacleField, other obstacle types (ObstacleField,
+		OccupancyGrid, SpatialHash) are used through their own compute_collision_mask.
+		Obstacles that only provide is_in_collision_with_points, as used by
+		is_collision_free, are tested one point at a time
+		"""
+		shapes = [obs for obs in self.obstacle_list if isinstance(obs, (Polygon, Circle))]
+		checkers = []
+		for obs in self.obstacle_list:
+			if isinstance(obs, (Polygon, Circle)):
+				continue
+			if hasattr(obs, 'compute_collision_mask'):
+				checkers.append(obs.compute_collision_mask)
+			else:
+				checkers.append(lambda points, obs=obs: np.array(
+					[obs.is_in_collision_with_points(point[None, :]) for point in points], dtype=bool))
+		if shapes:
+			checkers.append(ObstacleField(shapes).compute_collision_mask)
+		return checkers
+
+	def steer(self, from_node, to_node, extend_length=float("inf")):
+		"""
+		Given two nodes from_node, to_node, this method returns a node new_node such that new_node
+		is "closer" to to_node than from_node is.
+		"""
+
+		new_node = self.Node(from_node.x, from_node.y)
+		d, theta = self.calc_distance_and_angle(new_node, to_node)
+		cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+
+		new_node.path_x = [new_node.x]
+		new_node.path_y = [new_node.y]
+
+		if extend_length > d:
+			extend_length = d
+
+		# How many intermediate positions are considered between from_node and to_node
+		n_expand = math.floor(extend_length / self.path_resolution)
+
+		# Compute all intermediate positions
+		for _ in range(n_expand):
+			new_node.x += self.path_resolution * cos_theta
+			new_node.y += self.path_resolution * sin_theta
+			new_node.path_x.append(new_node.x)
+			new_node.path_y.append(new_node.y)
+
+		d, _ = self.calc_distance_and_angle(new_node, to_node)
+		if d <= self.path_resolution:
+			new_node.path_x.append(to_node.x)
+			new_node.path_y.append(to_node.y)
+
+		new_node.parent = from_node
+
+		return new_node
+
+	def is_collision_free(self, new_node):
+		"""
+		Determine if nearby_node (new_node) is in the collision-free space.
+		"""
+		if new_node is None:
+			return True
+
+		points = np.vstack((new_node.path_x, new_node.path_y)).T
+		for obs in self.obstacle_list:
+			in_collision = obs.is_in_collision_with_points(points)
+			if in_collision:
+				return False
+
+		return True  # safe
+
+	def generate_final_course(self, goal_ind):
+		"""
+		Reconstruct path from start to end node
+		"""
+		path = [[self.end.x, self.end.y]]
+		path.extend(self.tree.path_to_root(goal_ind).tolist())
+
+		return path
+
+	def calc_dist_to_goal(self, x, y):
+		dx = x - self.end.x
+		dy = y - self.end.y
+		return math.hypot(dx, dy)
+
+	def get_random_node(self):
+		x = self.width * np.random.random_sample()
+		y = self.height * np.random.random_sample()
+		rnd = self.Node(x, y)
+		return rnd
+
+	def draw_graph(self):
+		fig = plt.figure(figsize=(8, 6))
+		ax = fig.add_subplot(111, aspect='equal', autoscale_on=False,
+							 xlim=(0, 16), ylim=(0, 12))
+		ax.grid()
+
+		ax.plot(self.start.x, self.start.y, "^r", lw=5)
+		ax.plot(self.end.x, self.end.y, "^c", lw=5)
+
+		for obs in self.obstacle_list:
+			if isinstance(obs, Circle):
+				cx, cy = obs.center
+				self.plot_circle(ax, cx, cy, obs.radius)
+			else:
+				ox, oy = obs.plot_obstacle()
+				ax.scatter(ox, oy, s=7, c='k')
+
+		coordinates = self.tree.coordinates
+		for idx in range(1, len(self.tree)):
+			if idx in self.tree.edge_paths:
+				path_x, path_y = self.tree.edge_paths[idx]
+			else:
+				parent = self.tree.parents[idx]
+				path_x, path_y = coordinates[[parent, idx]].T
+			ax.plot(path_x, path_y, "g.-")
+
+		return fig, ax
+
+	def get_nearest_node_index(self, node_list, rnd_node):
+		"""
+		Index of the node closest to rnd_node. As in the practical, node_list is a
+		list of Nodes to scan. With node_list=None the tree is searched instead,
+		through its nearest-neighbour index
+		"""
+		if node_list is None:
+			idx, _ = self.tree.index.nearest((rnd_node.x, rnd_node.y))
+			return idx
+
+		dlist = [(node.x - rnd_node.x) ** 2 + (node.y - rnd_node.y) ** 2 for node in node_list]
+		return dlist.index(min(dlist))
+
+	@staticmethod
+	def calc_distance_and_angle(from_node, to_node):
+		dx = to_node.x - from_node.x
+		dy = to_node.y - from_node.y
+		d = math.hypot(dx, dy)
+		theta = math.atan2(dy, dx)
+		return d, theta
+
+	@staticmethod
+	def plot_circle(ax, x, y, size, color="-b"):  # pragma: no cover
+		deg = list(range(0, 360, 5))
+		deg.append(0)
+		xl = [x + size * math.cos(np.deg2rad(d)) for d in deg]
+		yl = [y + size * math.sin(np.deg2rad(d)) for d in deg]
+		ax.plot(xl, yl, color)
+
+
+class RRTStar(RRT):
+	"""
+	Asymptotically optimal RRT (RRT*), built on the same steer and is_collision_free
+	primitives as RRT.
+
+	Every new node is connected to the neighbour within the connection radius
+	that gives it the lowest cost, and the neighbours are then rewired through
+	the new node when that lowers their cost. The connection radius shrinks as
+	connect_circle_dist * sqrt(log(n) / n) and never exceeds expand_dis.
+	Neighbour queries go through the kd-tree of the RRTTree.
+
+	If informed is True, once a path to the goal is known new samples are drawn
+	from the ellipse with foci at start and goal that contains every point that
+	could still shorten the path (informed RRT*).
+
+	Unlike RRT, the planner keeps growing the tree until max_points nodes and
+	returns the best path found.
+	"""
+
+	def __init__(self, start=np.zeros(2),
+				 goal=np.array([120,90]),
+				 obstacle_list=None,
+				 width = 160,
+				 height=100,
+				 expand_dis=3.0,
+				 path_resolution=0.5,
+				 max_points=200,
+				 keep_edge_paths=False,
+				 connect_circle_dist=50.0,
+				 informed=True):
+		RRT.__init__(self, start=start, goal=goal, obstacle_list=obstacle_list, width=width,
+					 height=height, expand_dis=expand_dis, path_resolution=path_resolution,
+					 max_points=max_points, keep_edge_paths=keep_edge_paths)
+		self.connect_circle_dist = connect_circle_dist
+		self.informed = informed
+		self.goal_candidates = []
+		self.best_cost = np.inf
+
+	def planning(self, animation=True):
+		"""
+		rrt* path planning
+
+		animation: accepted for compatibility with the practical and ignored
+		"""
+		self.tree = RRTTree((self.start.x, self.start.y), keep_edge_paths=self.keep_edge_paths,
+							track_children=True)
+		self.goal_candidates = []
+		self.best_cost = np.inf
+		self.iterations = 0
+
+		while len(self.tree) <= self.max_nodes:
+			self.iterations += 1
+			rnd_node = self.get_random_node()
+
+			nearest_ind = self.get_nearest_node_index(None, rnd_node)
+			new_node = self.steer(self.get_node(nearest_ind), rnd_node, self.expand_dis)
+			if not self.is_collision_free(new_node):
+				continue
+
+			near_inds = self.find_near_nodes(new_node)
+			parent_ind, parent_node = self.choose_parent(new_node, near_inds, nearest_ind)
+			new_ind = self.add_node(parent_node, parent_ind)
+			self.rewire(new_ind, near_inds)
+
+			# Remember the nodes that can be connected to the goal
+			if self.calc_dist_to_goal(parent_node.x, parent_node.y) <= self.expand_dis:
+				final_node = self.steer(parent_node, self.end, self.expand_dis)
+				if self.is_collision_free(final_node):
+					self.goal_candidates.append(new_ind)
+					self.best_cost = min(self.best_cost, self.calc_cost_to_goal(new_ind))
+
+		if not self.goal_candidates:
+			return None  # cannot find path
+
+		# Costs may have decreased through rewiring since the candidates were found
+		costs = [self.calc_cost_to_goal(i) for i in self.goal_candidates]
+		return self.generate_final_course(self.goal_candidates[int(np.argmin(costs))])
+
+	def calc_cost_to_goal(self, idx):
+		x, y = self.tree.coordinates[idx]
+		return self.tree.costs[idx] + self.calc_dist_to_goal(x, y)
+
+	def find_near_nodes(self, new_node):
+		"""
+		Indices of the tree nodes within the connection radius of new_node
+		"""
+		n = len(self.tree) + 1
+		radius = min(self.connect_circle_dist * math.sqrt(math.log(n) / n), self.expand_dis)
+		return self.tree.index.query_radius((new_node.x, new_node.y), radius)
+
+	def choose_parent(self, new_node, near_inds, nearest_ind):
+		"""
+		Among the near nodes, select the one through which new_node is reached
+		with the lowest cost and a collision-free edge. Candidates are checked in
+		order of cost, so only the edges that can win are collision checked
+
+		Method returns the index of the parent and new_node steered from it
+		"""
+		if len(near_inds) == 0:
+			return nearest_ind, new_node
+
+		coordinates = self.tree.coordinates
+		dist = np.hypot(coordinates[near_inds, 0] - new_node.x, coordinates[near_inds, 1] - new_node.y)
+		costs = self.tree.costs[near_inds] + dist
+
+		for i in np.argsort(costs):
+			near_ind = near_inds[i]
+			if near_ind == nearest_ind:
+				return nearest_ind, new_node
+			edge_node = self.steer(self.get_node(near_ind), new_node)
+			if self.is_collision_free(edge_node):
+				return near_ind, edge_node
+
+		return nearest_ind, new_node
+
+	def rewire(self, new_ind, near_inds):
+		"""
+		Connect near nodes through new_ind when that lowers their cost
+		"""
+		if len(near_inds) == 0:
+			return
+
+		coordinates = self.tree.coordinates
+		dist = np.hypot(coordinates[near_inds, 0] - coordinates[new_ind, 0],
+						coordinates[near_inds, 1] - coordinates[new_ind, 1])
+		new_costs = self.tree.costs[new_ind] + dist
+		improved = near_inds[new_costs < self.tree.costs[near_inds]]
+
+		new_node = self.get_node(new_ind)
+		for near_ind in improved:
+			# The cost may have changed through a previous rewire in this loop
+			if self.tree.costs[new_ind] + self.tree.distance(new_ind, near_ind) >= self.tree.costs[near_ind]:
+				continue
+			edge_node = self.steer(new_node, self.get_node(near_ind))
+			if self.is_collision_free(edge_node):
+				self.tree.rewire(near_ind, new_ind, (edge_node.path_x, edge_node.path_y))
+
+	def get_random_node(self):
+		if not self.informed or not np.isfinite(self.best_cost):
+			return RRT.get_random_node(self)
+
+		return self.sample_ellipse(self.best_cost)
+
+	def sample_ellipse(self, c_best):
+		"""
+		Uniform sample inside the ellipse with foci at start and goal where the
+		sum of the distances to the foci is at most c_best
+		"""
+		start = np.array([self.start.x, self.start.y])
+		goal = np.array([self.end.x, self.end.y])
+		c_min = np.linalg.norm(goal - start)
+		center = (start + goal) / 2.0
+		theta = math.atan2(goal[1] - start[1], goal[0] - start[0])
+		rotation = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+		radii = np.array([c_best / 2.0, math.sqrt(max(c_best ** 2 - c_min ** 2, 0.0)) / 2.0])
+
+		while True:
+			# Uniform sample in the unit disc
+			r = math.sqrt(np.random.random_sample())
+			phi = 2 * math.pi * np.random.random_sample()
+			x, y = center + rotation @ (radii * np.array([r * math.cos(phi), r * math.sin(phi)]))
+			if 0 <= x <= self.width and 0 <= y <= self.height:
+				return self.Node(x, y)
+
+
+class RRTConnect(RRT):
+	"""
+	Bidirectional RRT (RRT-Connect), built on the same steer and is_collision_free
+	primitives as RRT.
+
+	One tree grows from the start and another from the goal. At every iteration,
+	one tree is extended one step towards a random sample and the other tree
+	greedily extends towards the new node until it reaches it or hits an
+	obstacle. The roles of the trees are swapped after every iteration.
+
+	self.iterations holds the number of sampling iterations of the last call to
+	planning, so it can be compared with RRT
+	"""
+
+	def __init__(self, start=np.zeros(2),
+				 goal=np.array([120,90]),
+				 obstacle_list=None,
+				 width = 160,
+				 height=100,
+				 expand_dis=3.0,
+				 path_resolution=0.5,
+				 max_points=200,
+				 keep_edge_paths=False):
+		RRT.__init__(self, start=start, goal=goal, obstacle_list=obstacle_list, width=width,
+					 height=height, expand_dis=expand_dis, path_resolution=path_resolution,
+					 max_points=max_points, keep_edge_paths=keep_edge_paths)
+		self.start_tree = self.tree
+		self.end_tree = RRTTree((self.end.x, self.end.y), keep_edge_paths=keep_edge_paths)
+
+	def planning(self):
+		"""
+		rrt connect path planning
+		"""
+		self.start_tree = RRTTree((self.start.x, self.start.y), keep_edge_paths=self.keep_edge_paths)
+		self.end_tree = RRTTree((self.end.x, self.end.y), keep_edge_paths=self.keep_edge_paths)
+		self.tree = self.start_tree
+		self.iterations = 0
+
+		tree_a, tree_b = self.start_tree, self.end_tree
+		while len(self.start_tree) + len(self.end_tree) <= self.max_nodes:
+			self.iterations += 1
+
+			# 1. Sample and extend tree_a one step
+			rnd_node = self.get_random_node()
+			new_ind = self.extend(tree_a, rnd_node)
+
+			if new_ind is not None:
+				# 2. Greedily extend tree_b towards the new node
+				target = self.get_tree_node(tree_a, new_ind)
+				connect_ind = self.connect(tree_b, target)
+
+				# 3. If the trees meet, return the path from start to end
+				if connect_ind is not None:
+					if tree_a is self.start_tree:
+						return self.generate_final_course(new_ind, connect_ind)
+					return self.generate_final_course(connect_ind, new_ind)
+
+			tree_a, tree_b = tree_b, tree_a
+
+		return None  # cannot find path
+
+	@staticmethod
+	def get_tree_node(tree, idx):
+		x, y = tree.coordinates[idx]
+		return RRT.Node(x, y)
+
+	def extend(self, tree, to_node):
+		"""
+		Adds to the tree a node steered from its closest node towards to_node.
+		Returns the index of the new node, or None if the edge is in collision
+		"""
+		nearest_ind, _ = tree.index.nearest((to_node.x, to_node.y))
+		new_node = self.steer(self.get_tree_node(tree, nearest_ind), to_node, self.expand_dis)
+		if not self.is_collision_free(new_node):
+			return None
+
+		edge_path = (new_node.path_x, new_node.path_y) if self.keep_edge_paths else None
+		return tree.add((new_node.x, new_node.y), nearest_ind, edge_path)
+
+	def connect(self, tree, to_node):
+		"""
+		Extends the tree towards to_node until it reaches it (returns the index of
+		the node that reaches it) or an edge is in collision (returns None)
+		"""
+		while True:
+			new_ind = self.extend(tree, to_node)
+			if new_ind is None:
+				return None
+
+			x, y = tree.coordinates[new_ind]
+			if math.hypot(to_node.x - x, to_node.y - y) <= self.path_resolution:
+				return new_ind
+
+	def generate_final_course(self, start_mid_point, end_mid_point):
+		"""
+		Reconstruct path from start to end node
+		"""
+		# First half, from start to the meeting point
+		path = self.start_tree.path_to_root(start_mid_point)[::-1].tolist()
+
+		# Other half, from the meeting point to end
+		path.extend(self.end_tree.path_to_root(end_mid_point).tolist())
+
+		return path
+
+	def draw_graph(self):
+		self.tree = self.start_tree
+		fig, ax = RRT.draw_graph(self)
+
+		coordinates = self.end_tree.coordinates
+		for idx in range(1, len(self.end_tree)):
+			if idx in self.end_tree.edge_paths:
+				path_x, path_y = self.end_tree.edge_paths[idx]
+			else:
+				parent = self.end_tree.parents[idx]
+				path_x, path_y = coordinates[[parent, idx]].T
+			ax.plot(path_x, path_y, "b.-")
+
+		return fig, ax
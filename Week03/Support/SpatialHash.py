@@ -0,0 +1,193 @@
+import numpy as np
+from Obstacle import *
+
+
+class SpatialHash:
+	"""
+	Broad-phase index over obstacle bounding boxes
+
+	The plane is divided into square cells of size cell_size. Every obstacle is
+	registered in all the cells its axis-aligned bounding box (AABB) overlaps, so a
+	query only needs to run the exact (narrow-phase) collision test on the few
+	obstacles registered in the cells around the query points.
+
+	Obstacles can be inserted and removed at any time, so dynamic obstacles do not
+	require rebuilding the index.
+	"""
+
+	def __init__(self, cell_size=5.0, obstacles=None):
+		self.cell_size = float(cell_size)
+
+		# Cell (i,j) -> set of obstacle ids
+		self.cells = {}
+		# Obstacle id -> obstacle object, AABB and cells it is registered in
+		self.obstacles = {}
+		self.aabbs = {}
+		self.obstacle_cells = {}
+		self.next_id = 0
+
+		if obstacles is not None:
+			for obs in obstacles:
+				self.insert(obs)
+
+	def __len__(self):
+		return len(self.obstacles)
+
+	@staticmethod
+	def compute_aabb(obstacle):
+		"""
+		Returns the bounding box of an obstacle as an array [min_x, min_y, max_x, max_y]
+		"""
+		if isinstance(obstacle, Circle):
+			c_x, c_y = obstacle.center
+			r = obstacle.radius
+			return np.array([c_x - r, c_y - r, c_x + r, c_y + r], dtype=float)
+
+		vertices = np.asarray(obstacle.vertices, dtype=float)
+		return np.concatenate((vertices.min(axis=0), vertices.max(axis=0)))
+
+	def __cell_range__(self, aabb):
+		i_min, j_min = np.floor(aabb[0:2] / self.cell_size).astype(int)
+		i_max, j_max = np.floor(aabb[2:4] / self.cell_size).astype(int)
+		return [(i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)]
+
+	def __register__(self, obs_id):
+		aabb = self.compute_aabb(self.obstacles[obs_id])
+		cells = self.__cell_range__(aabb)
+		for cell in cells:
+			self.cells.setdefault(cell, set()).add(obs_id)
+
+		self.aabbs[obs_id] = aabb
+		self.obstacle_cells[obs_id] = cells
+
+	def __unregister__(self, obs_id):
+		for cell in self.obstacle_cells.pop(obs_id):
+			bucket = self.cells[cell]
+			bucket.discard(obs_id)
+			if not bucket:
+				del self.cells[cell]
+
+		del self.aabbs[obs_id]
+
+	def insert(self, obstacle):
+		"""
+		Adds an obstacle to the index and returns its id
+		"""
+		obs_id = self.next_id
+		self.next_id += 1
+
+		self.obstacles[obs_id] = obstacle
+		self.__register__(obs_id)
+		return obs_id
+
+	def remove(self, obs_id):
+		"""
+		Removes the obstacle with id obs_id from the index and returns it
+		"""
+		self.__unregister__(obs_id)
+		return self.obstacles.pop(obs_id)
+
+	def update(self, obs_id):
+		"""
+		Re-registers an obstacle after it has been moved or resized
+		"""
+		self.__unregister__(obs_id)
+		self.__register__(obs_id)
+
+	def query_points(self, points, margin=0.0):
+		"""
+		Broad phase: find the obstacles whose bounding box, grown by margin, contains
+		at least one of the (N,2) points
+
+		Method returns a sorted list of obstacle ids
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		if not self.obstacles or points.shape[0] == 0:
+			return []
+
+		# Every cell that a point's margin box touches
+		reach = int(np.ceil(margin / self.cell_size))
+		keys = np.floor(points / self.cell_size).astype(int)
+		offsets = np.arange(-reach, reach + 1)
+		offsets = np.stack(np.meshgrid(offsets, offsets, indexing='ij'), axis=-1).reshape(-1, 2)
+		keys = np.unique((keys[:, None, :] + offsets[None, :, :]).reshape(-1, 2), axis=0)
+
+		candidates = set()
+		for i, j in keys:
+			bucket = self.cells.get((i, j))
+			if bucket:
+				candidates.update(bucket)
+
+		if not candidates:
+			return []
+
+		# Discard candidates whose grown AABB does not contain any point
+		candidates = np.array(sorted(candidates))
+		aabbs = np.array([self.aabbs[c] for c in candidates])
+		inside = (points[None, :, 0] >= aabbs[:, None, 0] - margin) & \
+				 (points[None, :, 1] >= aabbs[:, None, 1] - margin) & \
+				 (points[None, :, 0] <= aabbs[:, None, 2] + margin) & \
+				 (points[None, :, 1] <= aabbs[:, None, 3] + margin)
+
+		return candidates[np.any(inside, axis=1)].tolist()
+
+	def query_box(self, box_min, box_max):
+		"""
+		Broad phase: find the obstacles whose bounding box overlaps the box [box_min, box_max]
+
+		Method returns a sorted list of obstacle ids
+		"""
+		box = np.concatenate((np.asarray(box_min, dtype=float), np.asarray(box_max, dtype=float)))
+		candidates = set()
+		for cell in self.__cell_range__(box):
+			bucket = self.cells.get(cell)
+			if bucket:
+				candidates.update(bucket)
+
+		return sorted(c for c in candidates
+					  if np.all(self.aabbs[c][0:2] <= box[2:4]) and np.all(box[0:2] <= self.aabbs[c][2:4]))
+
+	def is_in_collision_with_points(self, points, min_dist=2.5):
+		"""
+		Collision test of a set of points against all indexed obstacles. Only the
+		obstacles returned by the broad phase are tested exactly.
+
+		Polygons are in collision with points closer than min_dist to their edges,
+		so the broad phase grows the bounding boxes by min_dist
+		"""
+		for obs_id in self.query_points(points, margin=min_dist):
+			obstacle = self.obstacles[obs_id]
+			if isinstance(obstacle, Circle):
+				in_collision = obstacle.is_in_collision_with_points(points)
+			else:
+				in_collision = obstacle.is_in_collision_with_points(points, min_dist)
+			if in_collision:
+				return True
+
+		return False
+
+	def compute_collision_mask(self, points, min_dist=2.5):
+		"""
+		Per-point version of is_in_collision_with_points, with the same collision
+		rules as ObstacleField.compute_collision_mask (circles have no margin). Each
+		obstacle returned by the broad phase is only tested against the points inside
+		its bounding box grown by min_dist
+
+		Method returns an (N,) boolean mask
+		"""
+		points = np.asarray(points, dtype=float).reshape(-1, 2)
+		mask = np.zeros(points.shape[0], dtype=bool)
+
+		for obs_id in self.query_points(points, margin=min_dist):
+			aabb = self.aabbs[obs_id]
+			near = np.flatnonzero(np.all((points >= aabb[0:2] - min_dist) & (points <= aabb[2:4] + min_dist), axis=1))
+			if near.size == 0:
+				continue
+
+			obstacle = self.obstacles[obs_id]
+			inside, clearance = obstacle.compute_points_containment(points[near])
+			if not isinstance(obstacle, Circle):
+				inside |= clearance < min_dist
+			mask[near] |= inside
+
+		return mask
@@ -0,0 +1,326 @@
+import math
+import heapq
+import numpy as np
+
+from OccupancyGrid import *
+
+
+# Path search on an OccupancyGrid. Cells are referred to by their integer index
+# row*cols + col and every cell is connected to its 8 neighbours. Straight moves
+# cost 1 and diagonal moves sqrt(2) (in cells). A diagonal move is only allowed if
+# both cells it cuts the corner of are free, so paths never squeeze between two
+# obstacles touching at a corner.
+#
+# As with the search functions in path_search, paths go from goal to start and
+# include the goal and start positions; False is returned if there is no path.
+
+SQRT2 = math.sqrt(2)
+
+# (row offset, col offset, cost) of the 8 moves
+MOVES = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+		 (-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2)]
+
+# Integer move costs used by DStarLite, in 1/COST_SCALE cells. Sums of integers do
+# not depend on the order of the additions, so keys that are equal with exact
+# arithmetic compare equal
+COST_SCALE = 1000000
+STRAIGHT_COST = COST_SCALE
+DIAGONAL_COST = round(SQRT2 * COST_SCALE)
+
+
+def compute_blocked_cells(grid, min_dist=0.0):
+	"""
+	Cells that cannot be traversed: occupied cells and, if min_dist > 0, cells whose
+	center is closer than min_dist to an obstacle (min_dist is usually the robot radius)
+
+	Method returns an (rows, cols) boolean array
+	"""
+	blocked = np.array(grid.occupancy, dtype=bool)
+	if min_dist > 0:
+		blocked |= np.asarray(grid.distance) < min_dist
+	return blocked
+
+
+def octile_distance(idx_a, idx_b, cols):
+	"""
+	Length of the shortest 8-connected path between two cells on an empty grid
+	"""
+	r_a, c_a = divmod(idx_a, cols)
+	r_b, c_b = divmod(idx_b, cols)
+	d_r, d_c = abs(r_a - r_b), abs(c_a - c_b)
+	return (SQRT2 - 1) * min(d_r, d_c) + max(d_r, d_c)
+
+
+def _point_to_index(grid, point):
+	# Index of the cell containing point, or None if it is outside the grid
+	rows, cols = grid.point_to_cell(point)
+	row, col = int(rows[0]), int(cols[0])
+	if not (0 <= row < grid.rows and 0 <= col < grid.cols):
+		return None
+	return row * grid.cols + col
+
+
+def _successors(idx, blocked, rows, cols):
+	# Yields (neighbour index, move cost) for the moves out of cell idx that are
+	# allowed. blocked is the flattened list of blocked cells
+	r, c = divmod(idx, cols)
+	for d_r, d_c, cost in MOVES:
+		n_r, n_c = r + d_r, c + d_c
+		if n_r < 0 or n_r >= rows or n_c < 0 or n_c >= cols:
+			continue
+		n_idx = n_r * cols + n_c
+		if blocked[n_idx]:
+			continue
+		if d_r and d_c and (blocked[n_r * cols + c] or blocked[r * cols + n_c]):
+			continue
+		yield n_idx, cost
+
+
+def _cells_to_path(grid, cells, start, goal):
+	# cells go from goal to start
+	cells = np.asarray(cells, dtype=np.int64)
+	centers = grid.cell_to_point(cells // grid.cols, cells % grid.cols)
+	return [np.array([goal[0], goal[1]])] + list(centers) + [np.array([start[0], start[1]])]
+
+
+def grid_a_star(grid, start, goal, min_dist=0.0):
+	"""
+	8-connected A* over an OccupancyGrid with the octile distance as heuristic.
+
+	Costs, parents and the closed set are flat arrays indexed by cell and the open
+	set is a heap of (priority, cell index) tuples, so no node objects are created
+
+	Method returns the path from goal to start (cell centers between the goal and
+	start positions), or False if there is no path
+	"""
+	rows, cols = grid.rows, grid.cols
+	blocked = compute_blocked_cells(grid, min_dist).ravel().tolist()
+
+	idx_start = _point_to_index(grid, start)
+	idx_goal = _point_to_index(grid, goal)
+	if idx_start is None or idx_goal is None or blocked[idx_start] or blocked[idx_goal]:
+		return False
+
+	n_cells = rows * cols
+	costs = [math.inf] * n_cells
+	parents = [-1] * n_cells
+	closed = bytearray(n_cells)
+	g_r, g_c = divmod(idx_goal, cols)
+
+	costs[idx_start] = 0.0
+	heap = [(octile_distance(idx_start, idx_goal, cols), idx_start)]
+	while heap:
+		_, node = heapq.heappop(heap)
+		if closed[node]:
+			continue
+		if node == idx_goal:
+			cells = [idx_goal]
+			while cells[-1] != idx_start:
+				cells.append(parents[cells[-1]])
+			return _cells_to_path(grid, cells, start, goal)
+		closed[node] = 1
+
+		n_cost = costs[node]
+		for idx, step in _successors(node, blocked, rows, cols):
+			if closed[idx]:
+				continue
+			cost = n_cost + step
+			if cost < costs[idx]:
+				costs[idx] = cost
+				parents[idx] = node
+				r, c = divmod(idx, cols)
+				d_r, d_c = abs(r - g_r), abs(c - g_c)
+				h = (SQRT2 - 1) * min(d_r, d_c) + max(d_r, d_c)
+				heapq.heappush(heap, (cost + h, idx))
+
+	return False
+
+
+class DStarLite:
+	"""
+	D* Lite incremental planner over an OccupancyGrid (Koenig and Likhachev, 2002)
+
+	The search runs backwards from the goal, so the cost-to-goal values g of the
+	cells stay valid when the robot moves. When cells change (update_cells or
+	update_grid), only the cells whose cost-to-goal is affected are repaired
+	instead of searching from scratch. Moves are the same as in grid_a_star.
+
+	- g, rhs: flat lists with the cost-to-goal of every cell and its one-step lookahead.
+	  Costs are integers in 1/COST_SCALE cells (STRAIGHT_COST and DIAGONAL_COST per
+	  move) so that they are exact: with float costs, the same path cost summed in
+	  a different order can differ in the last bit, which breaks the key
+	  comparisons of the repairs
+	- the priority queue is a heap of (k1, k2, cell) entries; queue_keys holds the
+	  current key of the cells in the queue, entries with other keys are stale
+
+	self.expanded counts the cells expanded so far, to compare the cost of repairs
+	with that of new searches
+	"""
+
+	def __init__(self, grid, start, goal, min_dist=0.0):
+		self.grid = grid
+		self.rows, self.cols = grid.rows, grid.cols
+		self.blocked = compute_blocked_cells(grid, min_dist).ravel().tolist()
+
+		self.start = np.array(start, dtype=float)
+		self.goal = np.array(goal, dtype=float)
+		self.idx_start = _point_to_index(grid, start)
+		self.idx_goal = _point_to_index(grid, goal)
+		if self.idx_start is None or self.idx_goal is None:
+			raise ValueError("start and goal must be inside the grid")
+
+		n_cells = self.rows * self.cols
+		self.g = [math.inf] * n_cells
+		self.rhs = [math.inf] * n_cells
+		self.km = 0
+		self.heap = []
+		self.queue_keys = {}
+		self.expanded = 0
+
+		self.rhs[self.idx_goal] = 0
+		self.__push__(self.idx_goal)
+
+	def heuristic(self, idx):
+		# Octile distance in integer costs
+		r_a, c_a = divmod(self.idx_start, self.cols)
+		r_b, c_b = divmod(idx, self.cols)
+		d_r, d_c = abs(r_a - r_b), abs(c_a - c_b)
+		return DIAGONAL_COST * min(d_r, d_c) + STRAIGHT_COST * (max(d_r, d_c) - min(d_r, d_c))
+
+	def calculate_key(self, idx):
+		g_rhs = min(self.g[idx], self.rhs[idx])
+		return (g_rhs + self.heuristic(idx) + self.km, g_rhs)
+
+	def __push__(self, idx):
+		key = self.calculate_key(idx)
+		self.queue_keys[idx] = key
+		heapq.heappush(self.heap, (key[0], key[1], idx))
+
+	def __top__(self):
+		# Discards stale entries and returns the top (key, cell) of the queue
+		while self.heap:
+			k1, k2, idx = self.heap[0]
+			if self.queue_keys.get(idx) == (k1, k2):
+				return (k1, k2), idx
+			heapq.heappop(self.heap)
+		return (math.inf, math.inf), None
+
+	def neighbours(self, idx):
+		"""
+		Moves between idx and its neighbours, as (neighbour, cost). Moves are
+		symmetric, so these are both the successors and the predecessors of idx.
+		A blocked cell has no moves
+		"""
+		if self.blocked[idx]:
+			return []
+		return [(n, STRAIGHT_COST if cost == 1.0 else DIAGONAL_COST)
+				for n, cost in _successors(idx, self.blocked, self.rows, self.cols)]
+
+	def update_vertex(self, idx):
+		if idx != self.idx_goal:
+			self.rhs[idx] = min([cost + self.g[n] for n, cost in self.neighbours(idx)], default=math.inf)
+
+		self.queue_keys.pop(idx, None)
+		if self.g[idx] != self.rhs[idx]:
+			self.__push__(idx)
+
+	def compute_shortest_path(self):
+		while True:
+			key, idx = self.__top__()
+			if idx is None:
+				break
+			if key >= self.calculate_key(self.idx_start) and self.rhs[self.idx_start] == self.g[self.idx_start]:
+				break
+
+			self.expanded += 1
+			new_key = self.calculate_key(idx)
+			if key < new_key:
+				self.__push__(idx)
+				continue
+
+			heapq.heappop(self.heap)
+			del self.queue_keys[idx]
+			if self.g[idx] > self.rhs[idx]:
+				self.g[idx] = self.rhs[idx]
+				for n, _ in self.neighbours(idx):
+					self.update_vertex(n)
+			else:
+				self.g[idx] = math.inf
+				self.update_vertex(idx)
+				for n, _ in self.neighbours(idx):
+					self.update_vertex(n)
+
+	def plan(self):
+		"""
+		Repairs the search if needed and returns the path from goal to start (as in
+		grid_a_star), or False if there is no path
+		"""
+		self.compute_shortest_path()
+		if math.isinf(self.g[self.idx_start]) or self.blocked[self.idx_start]:
+			return False
+
+		# Follow the best successor from start to goal. Costs are consistent after
+		# compute_shortest_path, so a cell visited twice means the search is broken
+		cells = [self.idx_start]
+		visited = {self.idx_start}
+		while cells[-1] != self.idx_goal:
+			options = self.neighbours(cells[-1])
+			if not options:
+				return False
+			n, cost = min(options, key=lambda option: option[1] + self.g[option[0]])
+			if math.isinf(cost + self.g[n]) or n in visited:
+				return False
+			cells.append(n)
+			visited.add(n)
+
+		return _cells_to_path(self.grid, cells[::-1], self.start, self.goal)
+
+	def move_start(self, start):
+		"""
+		Moves the start (robot position) without invalidating the search
+		"""
+		idx = _point_to_index(self.grid, start)
+		if idx is None:
+			raise ValueError("start must be inside the grid")
+
+		self.km += self.heuristic(idx)
+		self.idx_start = idx
+		self.start = np.array(start, dtype=float)
+
+	def update_cells(self, rows, cols, blocked):
+		"""
+		Sets the state of the given cells (True for blocked) and repairs the costs of
+		the cells affected. The path is recomputed by the next call to plan
+		"""
+		changed = set()
+		for row, col, state in np.broadcast(np.atleast_1d(rows), np.atleast_1d(cols), blocked):
+			idx = int(row) * self.cols + int(col)
+			if self.blocked[idx] != bool(state):
+				self.blocked[idx] = bool(state)
+				changed.add(idx)
+
+		# A cell changes its own moves and the diagonal moves between its
+		# neighbours, so the cell and its neighbours are updated
+		affected = set(changed)
+		for idx in changed:
+			r, c = divmod(idx, self.cols)
+			for d_r, d_c, _ in MOVES:
+				n_r, n_c = r + d_r, c + d_c
+				if 0 <= n_r < self.rows and 0 <= n_c < self.cols:
+					affected.add(n_r * self.cols + n_c)
+
+		for idx in affected:
+			self.update_vertex(idx)
+
+		return len(changed)
+
+	def update_grid(self, grid, min_dist=0.0):
+		"""
+		Replaces the obstacles with those of another grid with the same geometry, for
+		example one rasterized after the obstacles moved. Only the cells that changed
+		are repaired. Method returns the number of changed cells
+		"""
+		blocked = compute_blocked_cells(grid, min_dist)
+		changed_rows, changed_cols = np.nonzero(blocked != np.array(self.blocked).reshape(self.rows, self.cols))
+		self.grid = grid
+		return self.update_cells(changed_rows, changed_cols, blocked[changed_rows, changed_cols])
@@ -19,7 +19,7 @@ def is_point_in_segment(start_seg, end_seg, point_q):
     dist_2 = compute_distance_between_points(end_seg, point_q)
     dist_3 = compute_distance_between_points(start_seg, end_seg)
      
-    return dist_1 + dist_2 == dist_3
+    return np.isclose(dist_1 + dist_2, dist_3)
 
 
 def compute_lines_intersection(line_1, line_2):
@@ -119,43 +119,174 @@ def compute_distance_point_to_line_by_intersection(start_line, end_line, point_q
     return False
 
 
-def compute_distance_point_to_segment(start_seg, end_seg, point_q):
+def compute_distances_points_to_segments(points, segments):
     """
-    Computes distance from point_q and line segment defined by start_seg and end_seg
+    Computes the distance from every point in points to every segment in segments
     
-    This method first computes the distance (and othorgonal projection of point_q) 
-    to the line defined by start_seg and end_seg.
+    points is an (N,2) array of query points and segments is an (M,2,2) array where
+    segments[j,0] is the start and segments[j,1] is the end of segment j.
     
-    If proj_point_q is stricly inside the segment, it returns the distance
-    to the line and the indicator w=1
+    Each point is projected onto the line through every segment. The projection
+    parameter t tells where that projection falls:
+    - 0 <= t <= 1: the orthogonal projection is the closest point and w=0
+    - t < 0: the start of the segment is the closest point and w=1
+    - t > 1: the end of the segment is the closest point and w=2
     
-    If proj_point_q is not in the segment, it determines the closest segment
-    point to point_q, computes the distance between point_q and the chosen segment point
+    Degenerate segments (start == end) are treated as a single point (w=1)
     
-    The indicator will be set to w=1 if start_seg is the closest. Otherwise,
-    end_seg is the closest point and w=2
+    Method returns:
+    - w: (N,M) integer array with the case indicator
+    - distances: (N,M) array of distances
+    - closest_points: (N,M,2) array with the closest point in each segment
     
     """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    
+    seg_start = segments[:, 0, :]
+    seg_vector = segments[:, 1, :] - seg_start
+    seg_length_sq = np.einsum('ij,ij->i', seg_vector, seg_vector)
+    
+    # Vectors from every segment start to every point, shape (N,M,2)
+    start_to_q = points[:, None, :] - seg_start[None, :, :]
+    
+    # Projection parameter of every point onto every segment line
+    t = np.einsum('nmk,mk->nm', start_to_q, seg_vector)
+    non_degenerate = seg_length_sq > 0
+    t[:, non_degenerate] /= seg_length_sq[non_degenerate]
+    t[:, ~non_degenerate] = -1.0
+    
+    w = np.zeros(t.shape, dtype=int)
+    w[t < 0] = 1
+    w[t > 1] = 2
     
-    # Compute point_q projection and distance from point_q to projection
-    proj_q, distance = compute_distance_point_to_line_by_intersection(start_seg, end_seg, point_q)
+    t_clipped = np.clip(t, 0.0, 1.0)
+    closest_points = seg_start[None, :, :] + t_clipped[:, :, None] * seg_vector[None, :, :]
     
-    # Compute distance to start and end of segment
-    dist_to_start = compute_distance_between_points(start_seg, point_q)
-    dist_to_end = compute_distance_between_points(end_seg, point_q)
+    diff = points[:, None, :] - closest_points
+    distances = np.hypot(diff[:, :, 0], diff[:, :, 1])
     
-    if is_point_in_segment(start_seg, end_seg, proj_q):
-        w = 0  # orthogonal projection is the closest point
-    elif dist_to_start < dist_to_end:
-        w = 1 # start is the closest point in segment
-        distance = dist_to_start
-        proj_q = start_seg
-    else:
-        w = 2 # end is the closest point in segment
-        distance = dist_to_end
-        proj_q = end_seg
+    return w, distances, closest_points
+
+
+def compute_edge_crossings(points, segments):
+    """
+    Determines which segments are crossed by a horizontal ray cast from each point 
+    towards +x. This is the building block of the even-odd (crossing number) test: 
+    a point is inside a closed polygon if the ray crosses an odd number of its edges.
+    
+    points is an (N,2) array and segments is an (M,2,2) array
+    
+    Method returns an (N,M) boolean array
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    
+    p_x, p_y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = segments[:, 0, 0], segments[:, 0, 1]
+    x2, y2 = segments[:, 1, 0], segments[:, 1, 1]
+    
+    # Only edges that straddle the ray height can be crossed. Horizontal edges
+    # never straddle it, so the division below is only used where it is defined
+    straddles = (y1 > p_y) != (y2 > p_y)
+    dy = np.where(y2 != y1, y2 - y1, 1.0)
+    x_cross = x1 + (p_y - y1) * (x2 - x1) / dy
+    
+    return straddles & (p_x < x_cross)
+
+
+def compute_segment_intersections(start, end, segments, tol=1e-9):
+    """
+    Intersects the segment [start, end] with every segment in segments, an (M,2,2) array
+
+    The intersection point is start + s*(end-start) = segments[j,0] + u*(segments[j,1]-segments[j,0])
+
+    Method returns:
+    - s, u: (M,) arrays with the parameters of the intersection along both segments
+    - valid: (M,) boolean array, True where the segments intersect (within tol).
+      Parallel segments are never reported as intersecting
+    """
+    start = np.asarray(start, dtype=float)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+
+    r = np.asarray(end, dtype=float) - start
+    e = segments[:, 1, :] - segments[:, 0, :]
+    diff = segments[:, 0, :] - start
+
+    denom = r[0] * e[:, 1] - r[1] * e[:, 0]
+    parallel = np.abs(denom) <= tol * np.hypot(r[0], r[1]) * np.hypot(e[:, 0], e[:, 1])
+    denom = np.where(parallel, 1.0, denom)
+
+    s = (diff[:, 0] * e[:, 1] - diff[:, 1] * e[:, 0]) / denom
+    u = (diff[:, 0] * r[1] - diff[:, 1] * r[0]) / denom
+    valid = ~parallel & (s >= -tol) & (s <= 1 + tol) & (u >= -tol) & (u <= 1 + tol)
+
+    return s, u, valid
+
+
+def iterate_segment_samples(starts, ends, n_samples, step=None, chunk_size=200000):
+    """
+    Samples points along the segments [starts[j], ends[j]] (two (M,2) arrays), with
+    n_samples[j] points on segment j, and yields them in chunks of roughly chunk_size
+    points so that the temporaries stay bounded. A segment is never split across
+    chunks
+    
+    - step=None: the points are evenly spaced and include both ends (a single
+      point is the start)
+    - otherwise point k is start + k*step along the segment direction, as in the
+      step-based collision checks of the practicals
+    
+    Method yields (owner, points) pairs, where owner[i] is the segment of points[i]
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    n_samples = np.asarray(n_samples, dtype=np.int64)
+    n_segments = starts.shape[0]
+    
+    delta = ends - starts
+    if step is not None:
+        yaw = np.arctan2(delta[:, 1], delta[:, 0])
+        direction = np.vstack((np.cos(yaw), np.sin(yaw))).T
+    
+    first_sample = np.concatenate(([0], np.cumsum(n_samples)))
+    seg_start = 0
+    while seg_start < n_segments:
+        seg_end = int(np.searchsorted(first_sample, first_sample[seg_start] + chunk_size, side='right')) - 1
+        seg_end = min(max(seg_end, seg_start + 1), n_segments)
+        
+        counts = n_samples[seg_start:seg_end]
+        owner = np.repeat(np.arange(seg_start, seg_end), counts)
+        if owner.size:
+            # Index of every point within its segment
+            k = np.arange(owner.size) - np.repeat(first_sample[seg_start:seg_end] - first_sample[seg_start], counts)
+            if step is None:
+                t = k / np.maximum(n_samples[owner] - 1, 1)
+                points = starts[owner] + t[:, None] * delta[owner]
+            else:
+                points = starts[owner] + (k * step)[:, None] * direction[owner]
+            yield owner, points
+        
+        seg_start = seg_end
+
+
+def compute_distance_point_to_segment(start_seg, end_seg, point_q):
+    """
+    Computes distance from point_q and line segment defined by start_seg and end_seg
+    
+    If the orthogonal projection of point_q lies inside the segment, it returns
+    the distance to the line and the indicator w=0
+    
+    If the projection is not in the segment, the closest point is one of the
+    segment ends. The indicator will be set to w=1 if start_seg is the closest.
+    Otherwise, end_seg is the closest point and w=2
+    
+    This is a single point, single segment call of compute_distances_points_to_segments
+    
+    """
+    segment = np.array([start_seg, end_seg], dtype=float)
+    w, distance, proj_q = compute_distances_points_to_segments(point_q, segment[None, :, :])
                 
-    return w, distance, proj_q
+    return int(w[0, 0]), distance[0, 0], proj_q[0, 0]
 
 
 def get_direction_from_points(p1, p2):
@@ -0,0 +1,235 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from Obstacle import *
+from math_functions import iterate_segment_samples
+
+
+# Post-processing of planned paths (PRM, RRT, ...). Paths are handled as (N,2) arrays
+# of waypoints; lists of [x,y] pairs are converted on entry.
+#
+# Collision checks are done through a collision function, that maps an (N,2) array of
+# points to an (N,) boolean mask, True for points in collision. make_collision_checker
+# builds one from the obstacle representations used in the practicals.
+
+
+def make_collision_checker(obstacles, min_dist=None):
+	"""
+	Builds a per-point collision function from:
+	- a list of Polygon/Circle obstacles (checked at once through an ObstacleField)
+	- an ObstacleField, OccupancyGrid or SpatialHash (through compute_collision_mask)
+	- a single Polygon or Circle
+	- any other object with is_in_collision_with_points, tested one point at a time
+	- a cKDTree of obstacle points, as used by the PRM (min_dist is the robot radius)
+	- a function, which is returned unchanged
+	- a list of any of the above
+	min_dist overrides the default clearance of each representation
+	"""
+	if isinstance(obstacles, cKDTree):
+		if min_dist is None:
+			raise ValueError("min_dist (robot radius) is required for point obstacles")
+		return lambda points: obstacles.query(points, distance_upper_bound=min_dist)[0] < min_dist
+
+	if hasattr(obstacles, 'compute_collision_mask'):
+		if min_dist is None:
+			return obstacles.compute_collision_mask
+		return lambda points: obstacles.compute_collision_mask(points, min_dist)
+
+	if isinstance(obstacles, (Polygon, Circle)):
+		return make_collision_checker(ObstacleField([obstacles]), min_dist)
+
+	if hasattr(obstacles, 'is_in_collision_with_points'):
+		args = () if min_dist is None else (min_dist,)
+		return lambda points: np.array([obstacles.is_in_collision_with_points(point[None, :], *args)
+										for point in np.asarray(points, dtype=float).reshape(-1, 2)], dtype=bool)
+
+	if callable(obstacles):
+		return obstacles
+
+	shapes = [obs for obs in obstacles if isinstance(obs, (Polygon, Circle))]
+	checkers = [make_collision_checker(obs, min_dist) for obs in obstacles
+				if not isinstance(obs, (Polygon, Circle))]
+	if shapes:
+		checkers.append(make_collision_checker(ObstacleField(shapes), min_dist))
+
+	def collision_fn(points):
+		mask = np.zeros(len(points), dtype=bool)
+		for checker in checkers:
+			mask |= checker(points)
+		return mask
+
+	return collision_fn
+
+
+def path_length(path):
+	path = np.asarray(path, dtype=float).reshape(-1, 2)
+	return float(np.sum(np.hypot(*np.diff(path, axis=0).T)))
+
+
+def check_segments_collision_fn(collision_fn, starts, ends, step, chunk_size=200000, coarse_factor=1):
+	"""
+	Samples every segment [start, end] with spacing at most step (both ends included)
+	and checks all the samples with collision_fn, in chunks of about chunk_size points
+
+	If coarse_factor > 1, the segments are first sampled with spacing coarse_factor*step
+	and only the ones without collision at that resolution are checked with spacing step.
+	Segments that cross obstacles are usually rejected by the cheap coarse pass
+
+	Method returns an (M,) boolean array, True for segments in collision
+	"""
+	starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+	ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+	n_segments = starts.shape[0]
+
+	if coarse_factor > 1:
+		in_collision = check_segments_collision_fn(collision_fn, starts, ends, coarse_factor * step, chunk_size)
+		free = np.flatnonzero(~in_collision)
+		if free.size:
+			in_collision[free] = check_segments_collision_fn(collision_fn, starts[free], ends[free], step, chunk_size)
+		return in_collision
+
+	delta = ends - starts
+	n_samples = np.ceil(np.hypot(delta[:, 0], delta[:, 1]) / step).astype(np.int64) + 1
+
+	in_collision = np.zeros(n_segments, dtype=bool)
+	for owner, points in iterate_segment_samples(starts, ends, n_samples, chunk_size=chunk_size):
+		in_collision[owner[collision_fn(points)]] = True
+
+	return in_collision
+
+
+def remove_collinear_points(path, tolerance=1e-6):
+	"""
+	Removes repeated waypoints and the waypoints that lie within tolerance of the
+	line joining their neighbours. The first and last waypoints are always kept
+	"""
+	path = np.asarray(path, dtype=float).reshape(-1, 2)
+
+	# Repeated waypoints
+	keep = np.r_[True, np.any(np.abs(np.diff(path, axis=0)) > 0, axis=1)]
+	path = path[keep]
+	if path.shape[0] < 3:
+		return path
+
+	# Distance from every interior waypoint to the line through its neighbours
+	prev_delta = path[1:-1] - path[:-2]
+	next_delta = path[2:] - path[:-2]
+	cross = np.abs(prev_delta[:, 0] * next_delta[:, 1] - prev_delta[:, 1] * next_delta[:, 0])
+	base = np.hypot(next_delta[:, 0], next_delta[:, 1])
+	offset = np.where(base > 0, cross / np.where(base > 0, base, 1), np.hypot(*prev_delta.T))
+
+	# Only drop points that do not make the path turn back
+	forward = np.einsum('ij,ij->i', prev_delta, path[2:] - path[1:-1]) >= 0
+	keep = np.r_[True, (offset > tolerance) | ~forward, True]
+	return path[keep]
+
+
+def shortcut_path_greedy(path, collision_fn, step, block_size=64, coarse_factor=8):
+	"""
+	Greedy shortcutting: from the current waypoint, jump to the furthest waypoint
+	that can be reached in a straight line without collision.
+
+	The candidate segments are checked from the furthest waypoint backwards in
+	blocks of block_size, each block with a single batched collision query
+	"""
+	path = np.asarray(path, dtype=float).reshape(-1, 2)
+	n = path.shape[0]
+	if n < 3:
+		return path
+
+	result = [0]
+	i = 0
+	while i < n - 1:
+		next_i = i + 1
+		for block_end in range(n, i + 2, -block_size):
+			candidates = np.arange(max(block_end - block_size, i + 2), block_end)
+			free = ~check_segments_collision_fn(collision_fn, np.repeat(path[i:i+1], len(candidates), axis=0),
+											 path[candidates], step, coarse_factor=coarse_factor)
+			if np.any(free):
+				next_i = int(candidates[np.flatnonzero(free)[-1]])
+				break
+
+		result.append(next_i)
+		i = next_i
+
+	return path[result]
+
+
+def shortcut_path_random(path, collision_fn, step, iterations=20, batch_size=32, rng=None, coarse_factor=8):
+	"""
+	Randomized shortcutting: at every iteration, batch_size pairs of points are drawn
+	uniformly along the path and the straight segments joining them are checked in one
+	batched query. The collision-free shortcuts that do not overlap are applied, the
+	ones that shorten the path the most first
+	"""
+	rng = np.random.default_rng(rng)
+	path = np.asarray(path, dtype=float).reshape(-1, 2)
+
+	for _ in range(iterations):
+		if path.shape[0] < 3:
+			break
+
+		lengths = np.hypot(*np.diff(path, axis=0).T)
+		s_path = np.concatenate(([0], np.cumsum(lengths)))
+		total = s_path[-1]
+		if total == 0:
+			break
+
+		s = np.sort(rng.random((batch_size, 2)) * total, axis=1)
+		seg = np.clip(np.searchsorted(s_path, s, side='right') - 1, 0, len(lengths) - 1)
+
+		# Shortcuts inside a single segment do not change the path
+		useful = seg[:, 0] != seg[:, 1]
+		if not np.any(useful):
+			continue
+		s, seg = s[useful], seg[useful]
+
+		t = (s - s_path[seg]) / np.where(lengths[seg] > 0, lengths[seg], 1)
+		points = path[seg] + t[..., None] * (path[seg + 1] - path[seg])
+		gain = (s[:, 1] - s[:, 0]) - np.hypot(*(points[:, 1] - points[:, 0]).T)
+
+		free = ~check_segments_collision_fn(collision_fn, points[:, 0], points[:, 1], step, coarse_factor=coarse_factor)
+		candidates = np.flatnonzero(free & (gain > 1e-9))
+		if candidates.size == 0:
+			continue
+
+		# Apply non-overlapping shortcuts, largest gain first
+		selected = []
+		for c in candidates[np.argsort(-gain[candidates])]:
+			if all(seg[c, 1] < seg[o, 0] or seg[o, 1] < seg[c, 0] for o in selected):
+				selected.append(c)
+
+		pieces = []
+		last = 0
+		for c in sorted(selected, key=lambda c: seg[c, 0]):
+			pieces.append(path[last:seg[c, 0] + 1])
+			pieces.append(points[c])
+			last = seg[c, 1] + 1
+		pieces.append(path[last:])
+		path = remove_collinear_points(np.vstack(pieces), tolerance=0)
+
+	return path
+
+
+def resample_path(path, spacing):
+	"""
+	Resamples the path at a fixed arc-length spacing. The first and last waypoints are
+	kept, so the last interval can be shorter than spacing
+	"""
+	path = np.asarray(path, dtype=float).reshape(-1, 2)
+	lengths = np.hypot(*np.diff(path, axis=0).T)
+	s_path = np.concatenate(([0], np.cumsum(lengths)))
+	if s_path[-1] == 0:
+		return path[:1].copy()
+
+	s = np.arange(0, s_path[-1], spacing)
+	if s_path[-1] - s[-1] > 1e-9:
+		s = np.append(s, s_path[-1])
+	else:
+		s[-1] = s_path[-1]
+
+	# Drop zero-length segments so that the arc length is strictly increasing
+	keep = np.r_[True, lengths > 0]
+	x = np.interp(s, s_path[keep], path[keep, 0])
+	y = np.interp(s, s_path[keep], path[keep, 1])
+	return np.vstack((x, y)).T
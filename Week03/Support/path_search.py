@@ -1,6 +1,8 @@
 import os
 import random
 import math
+import heapq
+from collections import deque
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.spatial import cKDTree
@@ -21,64 +23,111 @@ def find_nearest(array, value):
 	return idx, array[idx]
 
 
-class Node:
+def _snap_to_roadmap(road_map, start, goal):
+	# Index of the roadmap vertices closest to start and goal
+	idx_start, _ = find_nearest(road_map.vertices, start)
+	idx_goal, _ = find_nearest(road_map.vertices, goal)
+	return int(idx_start), int(idx_goal)
+
+
+def _reconstruct_path(road_map, parents, idx_goal, start, goal):
 	"""
-	Node class for path search
+	Walks the parent array back from idx_goal. As in the original search, the
+	path goes from goal to start and includes the goal and start positions
 	"""
+	path = [np.array([goal[0], goal[1]])]
+	idx = idx_goal
+	while idx != -1:
+		path.append(np.array(road_map.vertices[idx, :]))
+		idx = parents[idx]
+	path.append(np.array([start[0], start[1]]))
+	return path
 
-	def __init__(self, point, cost=0, parent_index=0, roadmap_index=0):
-		self.x, self.y = point
-		self.cost = cost
-		self.parent_index = parent_index
-		self.idx_roadmap = roadmap_index
 
-	def __str__(self):
-		return str(self.x) + "," + str(self.y) + "," +\
-			   str(self.cost) + "," + str(self.parent_index)
-	
 def breadth_first_search(road_map, start, goal):
+	"""
+	Breadth-first search over the roadmap. Vertices are referred to by their
+	index in road_map.vertices and road_map.edges[i] lists the neighbours of vertex i.
+
+	Returns the path from goal to start as a list of points, or False if start
+	and goal are not connected
+	"""
+	idx_start, idx_goal = _snap_to_roadmap(road_map, start, goal)
+
+	# parents[i] == -2 means vertex i has not been visited yet
+	parents = [-2] * road_map.vertices.shape[0]
+	parents[idx_start] = -1
+	if idx_start == idx_goal:
+		return _reconstruct_path(road_map, parents, idx_goal, start, goal)
+
+	queue = deque([idx_start])
 
-			
-	idx_start, vertex_start = find_nearest(road_map.vertices, start)
-	idx_goal, vertex_goal = find_nearest(road_map.vertices, goal)
-			
-	start_node = Node(vertex_start, cost=0.0, parent_index=-1,roadmap_index=idx_start)
-	goal_node = Node(vertex_goal, cost=0.0, parent_index=-1, roadmap_index=idx_goal)
-	
-	queue = [start_node]
-	visited_nodes = {idx_start: start_node}
-	cur_idx = 0
-	
-	
-	def reconstruct_path():
-		path = [np.array([goal[0], goal[1]]), np.array([goal_node.x, goal_node.y])]
-		parent_index = goal_node.parent_index
-		while parent_index != -1:
-			n = visited_nodes[parent_index]
-			path.append(np.array([n.x, n.y]))
-			parent_index = n.parent_index
-		path.append(np.array([start[0], start[1]]))
-		return path
-		   
 	while queue:
-		node = queue.pop(0)
-		for idx in road_map.edges[node.idx_roadmap]:
-			if idx not in visited_nodes:
-				v = road_map.vertices[idx, :]
-				cost = node.cost + np.linalg.norm(np.array([node.x, node.y]) - v)
-				
-				# Create new node and mark it as visited
-				new_node = Node(v, cost=cost, parent_index=node.idx_roadmap, roadmap_index=idx)
-				visited_nodes[idx] = new_node
-				
-				# Add it to the queue
-				queue.append(new_node)
-				
-				# Verify if new visited node is goal 
-				if np.isclose(new_node.x, goal_node.x) and np.isclose(new_node.y, goal_node.y):
-					goal_node.idx_roadmap = idx
-					goal_node.parent_index = node.idx_roadmap
-					goal_node.cost = cost
-					return reconstruct_path()
-				
-	return False
\ No newline at end of file
+		node = queue.popleft()
+		for idx in road_map.edges[node]:
+			if parents[idx] == -2:
+				parents[idx] = node
+				# The goal is detected by index as soon as it is reached
+				if idx == idx_goal:
+					return _reconstruct_path(road_map, parents, idx_goal, start, goal)
+				queue.append(idx)
+
+	return False
+
+
+def _best_first_search(road_map, start, goal, use_heuristic):
+	# Shared implementation of Dijkstra and A*. Costs are edge lengths
+	idx_start, idx_goal = _snap_to_roadmap(road_map, start, goal)
+	n_vertices = road_map.vertices.shape[0]
+
+	# Plain Python lists are used in the inner loop, where per-element numpy
+	# indexing would dominate the run time
+	x, y = np.asarray(road_map.vertices, dtype=float).T.tolist()
+	parents = [-2] * n_vertices
+	costs = [math.inf] * n_vertices
+	closed = [False] * n_vertices
+
+	g_x, g_y = x[idx_goal], y[idx_goal]
+	hypot = math.hypot
+
+	parents[idx_start] = -1
+	costs[idx_start] = 0.0
+	heap = [(hypot(x[idx_start] - g_x, y[idx_start] - g_y) if use_heuristic else 0.0, idx_start)]
+
+	while heap:
+		_, node = heapq.heappop(heap)
+		if closed[node]:
+			continue
+		if node == idx_goal:
+			return _reconstruct_path(road_map, parents, idx_goal, start, goal)
+		closed[node] = True
+
+		n_x, n_y, n_cost = x[node], y[node], costs[node]
+		for idx in road_map.edges[node]:
+			if closed[idx]:
+				continue
+			cost = n_cost + hypot(x[idx] - n_x, y[idx] - n_y)
+			if cost < costs[idx]:
+				costs[idx] = cost
+				parents[idx] = node
+				priority = cost + hypot(x[idx] - g_x, y[idx] - g_y) if use_heuristic else cost
+				heapq.heappush(heap, (priority, idx))
+
+	return False
+
+
+def dijkstra_search(road_map, start, goal):
+	"""
+	Shortest path (sum of edge lengths) between start and goal on the roadmap.
+	Same inputs and output as breadth_first_search
+	"""
+	return _best_first_search(road_map, start, goal, use_heuristic=False)
+
+
+def a_star_search(road_map, start, goal):
+	"""
+	A* search with the Euclidean distance to the goal vertex as heuristic. It
+	finds the same shortest path as dijkstra_search while expanding fewer vertices.
+	Same inputs and output as breadth_first_search
+	"""
+	return _best_first_search(road_map, start, goal, use_heuristic=True)
@@ -8,13 +8,29 @@
 # and start = 2, values = [0.0 0.25 0.5 0.25] represents the same
 # distribution.
 # Claus Brenner, 26 OCT 2012
-from math import exp, ceil
+from math import ceil
+import numpy as np
+
+# Convolutions where both distributions are longer than this are done with the FFT.
+# Shorter ones are faster with the direct sum of np.convolve
+FFT_CONVOLUTION_MIN_LENGTH = 500
+
+
+def fft_convolve(a, b):
+    """Full linear convolution of the arrays a and b using the real FFT."""
+    n = len(a) + len(b) - 1
+    n_fft = 1 << (n - 1).bit_length()
+    c = np.fft.irfft(np.fft.rfft(a, n_fft) * np.fft.rfft(b, n_fft), n_fft)[:n]
+    # Round-off can leave tiny negative values where the result is zero
+    return np.maximum(c, 0.0)
+
 
 class Distribution:
-    """This class represents a discrete distribution."""
+    """This class represents a discrete distribution. The values are stored
+       in a numpy array."""
     def __init__(self, offset = 0, values = [1.0]):
         self.offset = offset
-        self.values = values[:]
+        self.values = np.array(values, dtype=float)
 
     def __repr__(self):
         s = "start = %d, values =" % self.offset
@@ -32,16 +48,26 @@ class Distribution:
 
     def normalize(self):
         """Normalizes a distribution so that the sum of all values is 1.0."""
-        s = float(sum(self.values))
+        s = float(np.sum(self.values))
         if s != 0.0:
-            self.values = [i / s for i in self.values]
+            self.values = self.values / s
 
     def value(self, index):
         index -= self.offset
         if index < 0 or index >= len(self.values):
             return 0.0
         else:
-            return self.values[index]
+            return float(self.values[index])
+
+    def values_in_range(self, start, stop):
+        """Returns an array with the values for the indices start ... stop-1
+           (zero outside the distribution)."""
+        vals = np.zeros(max(stop - start, 0))
+        lo = max(start, self.start())
+        hi = min(stop, self.stop())
+        if lo < hi:
+            vals[lo-start:hi-start] = self.values[lo-self.offset:hi-self.offset]
+        return vals
 
     def plotlists(self, start = None, stop = None):
         if start == None:
@@ -49,8 +75,8 @@ class Distribution:
         if stop == None:
             stop = self.stop()
         if start <= stop:
-            indices = [i + 0.5 for i in range(start, stop)]
-            vals = [self.value(i) for i in range(start, stop)]
+            indices = (np.arange(start, stop) + 0.5).tolist()
+            vals = self.values_in_range(start, stop).tolist()
             return (indices, vals)
         else:
             return ([], [])
@@ -65,12 +91,7 @@ class Distribution:
         """Returns a triangular distribution. The peak is at 'center' and it is
            zero at center +/- half_width. center and half_width are integers."""
         w = int(half_width)
-        c = int(center)
-        values = []
-        for i in range(-w+1, 0):
-            values.append(w+i)
-        for i in range(0, w):
-            values.append(w-i)
+        values = w - np.abs(np.arange(-w+1, w))
         d = Distribution(center-w+1, values)
         d.normalize()
         return d
@@ -83,10 +104,8 @@ class Distribution:
            to +5 sigma."""
         sigma2 = sigma * sigma
         extent = int(ceil(cut * sigma))
-        values = []
-        for x in range(mu - extent, mu + extent + 1):
-            values.append(exp((-0.5*(x-mu)*(x-mu))/sigma2))
-        d = Distribution(mu - extent, values)
+        x = np.arange(mu - extent, mu + extent + 1)
+        d = Distribution(mu - extent, np.exp((-0.5*(x-mu)*(x-mu))/sigma2))
         d.normalize()
         return d
 
@@ -98,28 +117,36 @@ class Distribution:
         # If weights are not given, generate them, all 1.0's.
         if not weights:
             weights = [1.0 for d in distributions]
-        # First make an all-zero list which covers all indices.
+        # First make an all-zero array which covers all indices.
         start = min([d.start() for d in distributions])
         stop  = max([d.stop() for d in distributions])
-        sum_dist = [0.0 for _ in range(start, stop)]
-        for i in range(len(distributions)):
-            dist = distributions[i]
+        sum_dist = np.zeros(stop - start)
+        for dist, weight in zip(distributions, weights):
             # Now weight all values and add them to sum_dist.
-            for j in range(len(dist.values)):
-                sum_dist[dist.start()-start+j] += dist.values[j] * weights[i]
+            sum_dist[dist.start()-start:dist.stop()-start] += dist.values * weight
         d = Distribution(start, sum_dist)
         Distribution.normalize(d)
         return d
-    
+
     def convolve(self, b):
-        #Convolve distribution a and b and return the resulting new distribution#
-        dist_lst = []
-        offs = (self.offset + b.offset)
-        for a_val in self.values:
-            res = []
-            for b_val in b.values:
-                res.append(a_val*b_val)
-            dist_lst.append(Distribution(offs, res))
-            offs +=1
-        c = Distribution.sum(dist_lst)
-        return c
\ No newline at end of file
+        """Convolve distribution a and b and return the resulting new distribution.
+           Short distributions are convolved directly, long ones with the FFT."""
+        if min(len(self.values), len(b.values)) > FFT_CONVOLUTION_MIN_LENGTH:
+            values = fft_convolve(self.values, b.values)
+        else:
+            values = np.convolve(self.values, b.values)
+        c = Distribution(self.offset + b.offset, values)
+        c.normalize()
+        return c
+
+    def multiply(self, b):
+        """Multiply two distributions and return the resulting (normalized)
+           distribution. The result only covers the indices where both overlap."""
+        start = max(self.start(), b.start())
+        stop = min(self.stop(), b.stop())
+        if start >= stop:
+            return Distribution(start, [])
+        values = self.values[start-self.offset:stop-self.offset] * b.values[start-b.offset:stop-b.offset]
+        c = Distribution(start, values)
+        c.normalize()
+        return c
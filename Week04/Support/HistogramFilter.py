@@ -0,0 +1,278 @@
+import time
+import numpy as np
+from scipy import signal
+
+from Distribution import *
+
+
+class HistogramFilter:
+	"""
+	Histogram (grid) Bayes filter in 1, 2 or 3 dimensions, e.g. (x), (x, y) or (x, y, theta)
+
+	The belief is stored like a Distribution, extended to n dimensions: values is an
+	array that holds the probabilities of the cells offset[d] ... offset[d]+values.shape[d]-1
+	along each dimension d, and all other cells have probability zero. Cells whose
+	probability falls below floor are set to zero after every step and the window is
+	shrunk to the cells left, so a concentrated belief only costs a few cells.
+
+	Periodic dimensions (such as theta) always keep all their cells and wrap around
+	in the predict step. Non-periodic dimensions are bounded by shape: probability
+	that moves outside the grid is dropped.
+
+	- predict(kernels): separable convolution with one 1D Distribution per dimension
+	  (e.g. Distribution.gaussian or Distribution.triangle in cell units)
+	- predict_forward: motion along the heading, for (x, y, theta) filters
+	- update(likelihood): multiplication by a likelihood grid or function
+
+	self.predict_time and self.update_time hold the duration of the last steps, and
+	report() summarizes the memory used by the belief
+	"""
+
+	def __init__(self, shape, resolution=1.0, origin=0.0, periodic=False, floor=0.0):
+		self.shape = tuple(int(n) for n in np.atleast_1d(shape))
+		self.ndim = len(self.shape)
+		if not 1 <= self.ndim <= 3:
+			raise ValueError("HistogramFilter supports 1, 2 or 3 dimensions")
+
+		self.resolution = np.broadcast_to(np.asarray(resolution, dtype=float), (self.ndim,)).copy()
+		self.origin = np.broadcast_to(np.asarray(origin, dtype=float), (self.ndim,)).copy()
+		self.periodic = tuple(bool(p) for p in np.broadcast_to(periodic, (self.ndim,)))
+		self.floor = floor
+
+		self.predict_time = 0.0
+		self.update_time = 0.0
+
+		# Start with a uniform belief
+		self.offset = np.zeros(self.ndim, dtype=int)
+		self.values = np.full(self.shape, 1.0 / np.prod(self.shape))
+
+	@staticmethod
+	def grid_shape(extent, resolution):
+		"""
+		Number of cells per dimension needed to cover extent with cells of size resolution
+		"""
+		return tuple(int(n) for n in np.ceil(np.asarray(extent, dtype=float) / np.asarray(resolution, dtype=float)))
+
+	@staticmethod
+	def shift_kernel(shift, sigma):
+		"""
+		Gaussian kernel of std sigma centered at a fractional shift (both in cells)
+
+		The gaussian is centered at the cell floor(shift) and its mass is split
+		linearly between that cell and the next one by the fractional part, so the
+		mean of the kernel is exactly shift. Rounding the shift to a whole cell
+		would lose motions shorter than half a cell at every step
+		"""
+		cell = int(np.floor(shift))
+		fraction = shift - cell
+		kernel = Distribution.gaussian(cell, sigma)
+		if fraction > 0.0:
+			kernel = Distribution(kernel.offset, np.convolve(kernel.values, [1.0 - fraction, fraction]))
+		return kernel
+
+	def set_belief(self, values, offset=None):
+		"""
+		Sets the belief to values, placed at cell offset (the first cell by default)
+		"""
+		self.values = np.array(values, dtype=float)
+		if self.values.ndim != self.ndim:
+			raise ValueError("values must have %d dimensions" % self.ndim)
+		self.offset = np.zeros(self.ndim, dtype=int) if offset is None else np.array(offset, dtype=int)
+		self.__wrap__()
+		self.__clip__()
+		self.__normalize_and_trim__()
+
+	def set_pulse(self, cell):
+		"""
+		Known state: probability 1.0 at cell, as Distribution.unit_pulse
+		"""
+		self.set_belief(np.ones((1,) * self.ndim), offset=cell)
+
+	def cell_to_point(self, cell):
+		return self.origin + (np.asarray(cell, dtype=float) + 0.5) * self.resolution
+
+	def point_to_cell(self, point):
+		return np.floor((np.asarray(point, dtype=float) - self.origin) / self.resolution).astype(int)
+
+	def cell_centers(self, axis):
+		"""
+		Coordinates of the centers of the cells of the window along axis
+		"""
+		cells = self.offset[axis] + np.arange(self.values.shape[axis])
+		return self.origin[axis] + (cells + 0.5) * self.resolution[axis]
+
+	def to_dense(self):
+		"""
+		Returns the belief over the whole grid as an array of shape self.shape
+		"""
+		dense = np.zeros(self.shape)
+		dense[self.__window__()] = self.values
+		return dense
+
+	def mode(self):
+		"""
+		Center of the most likely cell
+		"""
+		cell = np.unravel_index(np.argmax(self.values), self.values.shape)
+		return self.cell_to_point(self.offset + np.array(cell))
+
+	def __window__(self):
+		# Slices of the full grid covered by values
+		return tuple(slice(o, o + n) for o, n in zip(self.offset, self.values.shape))
+
+	def __wrap__(self):
+		# Folds the values of periodic dimensions into all their cells
+		for axis in range(self.ndim):
+			if not self.periodic[axis]:
+				continue
+			n = self.shape[axis]
+			cells = (self.offset[axis] + np.arange(self.values.shape[axis])) % n
+			values = np.moveaxis(self.values, axis, 0)
+			wrapped = np.zeros((n,) + values.shape[1:])
+			np.add.at(wrapped, cells, values)
+			self.values = np.moveaxis(wrapped, 0, axis)
+			self.offset[axis] = 0
+
+	def __clip__(self):
+		# Drops the values that fall outside the grid in non-periodic dimensions
+		window = []
+		for axis in range(self.ndim):
+			start = max(0, -self.offset[axis])
+			stop = min(self.values.shape[axis], self.shape[axis] - self.offset[axis])
+			window.append(slice(start, max(start, stop)))
+			self.offset[axis] += start
+		self.values = self.values[tuple(window)]
+
+	def __normalize_and_trim__(self):
+		total = self.values.sum()
+		if total > 0:
+			self.values /= total
+
+		if self.floor > 0:
+			self.values[self.values < self.floor] = 0.0
+
+		nonzero = self.values > 0
+		if not np.any(nonzero):
+			return
+
+		# Shrink the window to the bounding box of the non-zero cells
+		window = []
+		for axis in range(self.ndim):
+			if self.periodic[axis]:
+				window.append(slice(None))
+				continue
+			other_axes = tuple(a for a in range(self.ndim) if a != axis)
+			cells = np.flatnonzero(np.any(nonzero, axis=other_axes))
+			window.append(slice(cells[0], cells[-1] + 1))
+			self.offset[axis] += cells[0]
+		self.values = self.values[tuple(window)]
+
+		total = self.values.sum()
+		if total > 0:
+			self.values /= total
+
+	def predict(self, kernels):
+		"""
+		Motion update: convolves the belief with the kernel of every dimension, a
+		Distribution over cell offsets (None leaves the dimension unchanged). The
+		convolutions are separable, so their cost grows with the sum and not the
+		product of the kernel sizes
+		"""
+		t_start = time.perf_counter()
+		self.__convolve__(kernels)
+		self.predict_time = time.perf_counter() - t_start
+
+	def __convolve__(self, kernels):
+		# Body of predict, without the timing, so that predict_forward records a
+		# single predict_time for the whole step
+		for axis, kernel in enumerate(kernels):
+			if kernel is None:
+				continue
+			shape = [1] * self.ndim
+			shape[axis] = len(kernel.values)
+			# scipy chooses between direct and FFT convolution
+			self.values = np.maximum(signal.convolve(self.values, np.reshape(kernel.values, shape), mode='full'), 0.0)
+			self.offset[axis] += kernel.offset
+
+		self.__wrap__()
+		self.__clip__()
+		self.__normalize_and_trim__()
+
+	def predict_forward(self, distance, sigma, rotation=0.0, rotation_sigma=0.0, theta_axis=2):
+		"""
+		Motion update of an (x, y, theta) filter for a robot that moves distance along
+		its heading and then turns by rotation. Every heading slice is shifted by its
+		own (distance*cos(theta), distance*sin(theta)) with gaussian noise sigma, and the
+		heading is convolved with a gaussian of std rotation_sigma (units as the grid)
+		"""
+		if self.ndim != 3 or not self.periodic[theta_axis]:
+			raise ValueError("predict_forward needs an (x, y, theta) filter with a periodic theta")
+
+		t_start = time.perf_counter()
+		xy_axes = [a for a in range(3) if a != theta_axis]
+		values = np.moveaxis(self.values, theta_axis, 2)
+		theta = self.cell_centers(theta_axis)
+
+		# One separable gaussian kernel per heading, in cells, with the sub-cell part of the shift
+		kernels = []
+		for th in theta:
+			shift = distance * np.array([np.cos(th), np.sin(th)]) / self.resolution[xy_axes]
+			sigma_cells = np.maximum(sigma / self.resolution[xy_axes], 1e-3)
+			kernels.append([self.shift_kernel(s, sc) for s, sc in zip(shift, sigma_cells)])
+
+		# All slices are placed in a common window
+		low = [min(k[d].start() for k in kernels) for d in range(2)]
+		high = [max(k[d].stop() for k in kernels) for d in range(2)]
+		moved = np.zeros((values.shape[0] + high[0] - low[0] - 1, values.shape[1] + high[1] - low[1] - 1, values.shape[2]))
+		for i, (k_x, k_y) in enumerate(kernels):
+			if not np.any(values[:, :, i]):
+				continue
+			kernel = np.outer(k_x.values, k_y.values)
+			slice_x = slice(k_x.start() - low[0], k_x.start() - low[0] + values.shape[0] + len(k_x.values) - 1)
+			slice_y = slice(k_y.start() - low[1], k_y.start() - low[1] + values.shape[1] + len(k_y.values) - 1)
+			moved[slice_x, slice_y, i] = signal.convolve(values[:, :, i], kernel, mode='full')
+
+		self.values = np.moveaxis(np.maximum(moved, 0.0), 2, theta_axis)
+		self.offset[xy_axes[0]] += low[0]
+		self.offset[xy_axes[1]] += low[1]
+		self.__wrap__()
+		self.__clip__()
+		self.__normalize_and_trim__()
+
+		if rotation != 0.0 or rotation_sigma > 0.0:
+			kernels = [None] * 3
+			kernels[theta_axis] = self.shift_kernel(rotation / self.resolution[theta_axis],
+													max(rotation_sigma / self.resolution[theta_axis], 1e-3))
+			self.__convolve__(kernels)
+
+		self.predict_time = time.perf_counter() - t_start
+
+	def update(self, likelihood):
+		"""
+		Measurement update: multiplies the belief by the likelihood of the measurement.
+		likelihood is either an array over the whole grid (shape self.shape) or a
+		function of the cell center coordinates, one broadcastable array per
+		dimension, which is only evaluated over the current window
+		"""
+		t_start = time.perf_counter()
+		if callable(likelihood):
+			centers = np.ix_(*[self.cell_centers(axis) for axis in range(self.ndim)])
+			self.values = self.values * likelihood(*centers)
+		else:
+			self.values = self.values * np.asarray(likelihood)[self.__window__()]
+
+		self.__normalize_and_trim__()
+		self.update_time = time.perf_counter() - t_start
+
+	def report(self):
+		"""
+		Size of the grid and of the belief window, memory in bytes and duration of the
+		last predict and update steps in seconds
+		"""
+		return {'grid_cells': int(np.prod(self.shape)),
+				'grid_nbytes': int(np.prod(self.shape)) * self.values.itemsize,
+				'window_cells': int(self.values.size),
+				'nonzero_cells': int(np.count_nonzero(self.values)),
+				'window_nbytes': int(self.values.nbytes),
+				'predict_time': self.predict_time,
+				'update_time': self.update_time}
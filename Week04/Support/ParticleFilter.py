@@ -0,0 +1,152 @@
+import numpy as np
+
+
+class ParticleFilter:
+	"""
+	Particle filter localisation for the PenguinPi
+
+	The N particles are the rows of an (N,3) array of (x, y, theta) poses with
+	weights in an (N,) array, so every step is a handful of array operations
+	over all the particles:
+	- predict: the motion model of PenguinPi.drive, with the wheel speeds of every
+	  particle perturbed with the variances of the DriveMeasurement
+	- update: weights multiplied by the likelihood of a list of MarkerMeasurements,
+	  using the measurement model of PenguinPi.measure
+	- resample: systematic resampling, O(N)
+	"""
+
+	def __init__(self, num_particles=1000, wheels_width=0.15, wheels_radius=0.1, seed=None):
+		self.num_particles = num_particles
+		self.wheels_width = wheels_width
+		self.wheels_radius = wheels_radius
+		self.rng = np.random.default_rng(seed)
+
+		self.particles = np.zeros((num_particles, 3))
+		self.weights = np.full(num_particles, 1.0 / num_particles)
+
+	def initialise(self, state, covariance):
+		"""
+		Draws the particles from a gaussian with mean state (x, y, theta) and (3,3) covariance
+		"""
+		self.particles = self.rng.multivariate_normal(np.ravel(state), covariance, size=self.num_particles)
+		self.weights = np.full(self.num_particles, 1.0 / self.num_particles)
+
+	def predict(self, drive_meas):
+		"""
+		Moves every particle with the motion model of PenguinPi.drive. Each particle
+		gets its own noisy wheel speeds, drawn with variances left_cov and right_cov
+		"""
+		n = self.num_particles
+		left_speed = drive_meas.left_speed + np.sqrt(drive_meas.left_cov) * self.rng.standard_normal(n)
+		right_speed = drive_meas.right_speed + np.sqrt(drive_meas.right_cov) * self.rng.standard_normal(n)
+		dt = drive_meas.dt
+
+		# Linear and angular velocity, as in PenguinPi.__convert_wheel_speeds__
+		left_speed_m = left_speed * self.wheels_radius
+		right_speed_m = right_speed * self.wheels_radius
+		linear_velocity = (left_speed_m + right_speed_m) / 2.0
+		angular_velocity = (right_speed_m - left_speed_m) / self.wheels_width
+
+		x, y, theta = self.particles.T
+		straight = angular_velocity == 0
+
+		# Make a turn
+		safe_angular_velocity = np.where(straight, 1.0, angular_velocity)
+		R = linear_velocity / safe_angular_velocity
+		next_theta = theta + angular_velocity * dt
+		next_x = x + R * (-np.sin(theta) + np.sin(next_theta))
+		next_y = y + R * (np.cos(theta) - np.cos(next_theta))
+
+		# Drive straight, with the same signs as PenguinPi.drive
+		next_x = np.where(straight, x - np.cos(theta) * linear_velocity * dt, next_x)
+		next_y = np.where(straight, y - np.sin(theta) * linear_velocity * dt, next_y)
+
+		self.particles = np.column_stack((next_x, next_y, next_theta))
+
+	def compute_log_likelihood(self, measurements, markers, taglist=None):
+		"""
+		Log-likelihood of the measurements for every particle
+
+		markers is the 2xn array of marker positions. The marker of measurement lm is
+		column taglist.index(lm.tag), or column lm.tag if taglist is None
+		"""
+		if taglist is None:
+			idx_list = [lm.tag for lm in measurements]
+		else:
+			idx_list = [taglist.index(lm.tag) for lm in measurements]
+
+		landmarks = np.asarray(markers, dtype=float)[:, idx_list].T
+		z = np.array([np.ravel(lm.position) for lm in measurements])
+		information = np.linalg.inv(np.array([lm.covariance for lm in measurements]))
+
+		# Markers in the robot frame of every particle, as in PenguinPi.measure: (N,M,2)
+		x, y, theta = self.particles.T
+		c, s = np.cos(theta)[:, None], np.sin(theta)[:, None]
+		d_x = landmarks[None, :, 0] - x[:, None]
+		d_y = landmarks[None, :, 1] - y[:, None]
+		residual = z[None, :, :] - np.stack((c * d_x + s * d_y, -s * d_x + c * d_y), axis=-1)
+
+		return -0.5 * np.einsum('nmi,mij,nmj->n', residual, information, residual)
+
+	def update(self, measurements, markers, taglist=None):
+		"""
+		Multiplies the weights by the likelihood of the measurements (see compute_log_likelihood)
+		"""
+		if not measurements:
+			return
+
+		log_likelihood = self.compute_log_likelihood(measurements, markers, taglist)
+		# Subtract the maximum so that the exponential does not underflow for all particles
+		weights = self.weights * np.exp(log_likelihood - np.max(log_likelihood))
+		total = weights.sum()
+		if total > 0:
+			self.weights = weights / total
+		else:
+			self.weights = np.full(self.num_particles, 1.0 / self.num_particles)
+
+	def effective_sample_size(self):
+		return 1.0 / np.sum(self.weights ** 2)
+
+	def resample(self):
+		"""
+		Systematic resampling: N equally spaced positions with a single random offset
+		are compared with the cumulative weights. Particle i is copied once for every
+		position that falls in its slice of the cumulative weights, so the copies
+		are counted in O(N) without a search
+		"""
+		n = self.num_particles
+		cumulative = np.cumsum(self.weights)
+		cumulative /= cumulative[-1]
+
+		# Number of positions (u + k)/N, k = 0..N-1, below each cumulative weight
+		below = np.clip(np.ceil(cumulative * n - self.rng.random()), 0, n).astype(np.int64)
+		below[-1] = n
+		counts = np.diff(below, prepend=0)
+
+		self.particles = np.repeat(self.particles, counts, axis=0)
+		self.weights = np.full(n, 1.0 / n)
+
+	def step(self, drive_meas, measurements=None, markers=None, taglist=None, resample_threshold=0.5):
+		"""
+		One filter step: predict, update with the measurements (if any) and resample
+		when the effective sample size drops below resample_threshold*N
+		"""
+		self.predict(drive_meas)
+		if measurements:
+			self.update(measurements, markers, taglist)
+		if self.effective_sample_size() < resample_threshold * self.num_particles:
+			self.resample()
+
+	def get_state(self):
+		"""
+		Weighted mean of the particles (circular mean for theta), in (x, y, theta) format
+		"""
+		x, y = self.weights @ self.particles[:, 0:2]
+		theta = np.arctan2(self.weights @ np.sin(self.particles[:, 2]), self.weights @ np.cos(self.particles[:, 2]))
+		return (x, y, theta)
+
+	def get_covariance(self):
+		"""
+		Weighted covariance of the particle poses
+		"""
+		return np.cov(self.particles.T, aweights=self.weights)
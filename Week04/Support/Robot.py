@@ -56,6 +56,51 @@ class PenguinPi(object):
 	   
 		# Make next state our current state
 		self.set_state(next_x, next_y, next_theta)        
+
+	def integrate(self, controls, dt):
+		"""
+		 Drives the PenguiPi through a sequence of wheel speeds, controls is a (T,2)
+		 array of (left_speed, right_speed) rows applied for dt each.
+
+		 Same as calling drive with a DriveMeasurement for every row, but computed for
+		 all the rows at once: the headings are a cumulative sum of the rotations and
+		 the position steps use the same arc/straight formulas as drive. The sums are
+		 accumulated in the same order as drive, so the results are identical.
+
+		 Method returns the (T,3) array of states before each control is applied (as
+		 the state[c,:] = bot.get_state() loop in the practical). The robot ends in the
+		 state after the last control, and all the states are added to self.states
+		"""
+		controls = np.asarray(controls, dtype=float).reshape(-1, 2)
+		if controls.shape[0] == 0:
+			return np.zeros((0, 3))
+
+		# Linear and angular velocity of every step, as in __convert_wheel_speeds__
+		left_speed_m = controls[:, 0] * self.wheels_radius
+		right_speed_m = controls[:, 1] * self.wheels_radius
+		linear_velocity = (left_speed_m + right_speed_m) / 2.0
+		angular_velocity = (right_speed_m - left_speed_m) / self.wheels_width
+		straight = angular_velocity == 0
+
+		# Heading before (theta) and after (next_theta) every step
+		thetas = np.add.accumulate(np.concatenate(([self.theta], angular_velocity * dt)))
+		theta, next_theta = thetas[:-1], thetas[1:]
+
+		# Position steps. The radius of straight steps is never used
+		R = linear_velocity / np.where(straight, 1.0, angular_velocity)
+		d_x = np.where(straight, -np.cos(theta)*linear_velocity*dt, R * (-np.sin(theta) + np.sin(next_theta)))
+		d_y = np.where(straight, -np.sin(theta)*linear_velocity*dt, R * (np.cos(theta) - np.cos(next_theta)))
+
+		xs = np.add.accumulate(np.concatenate(([self.x], d_x)))
+		ys = np.add.accumulate(np.concatenate(([self.y], d_y)))
+		states = np.column_stack((xs, ys, thetas))
+
+		self.linear_velocity = linear_velocity[-1]
+		self.angular_velocity = angular_velocity[-1]
+		self.x, self.y, self.theta = states[-1]
+		self.states.extend(map(tuple, states[1:]))
+
+		return states[:-1]
 			
 	def get_state(self):
 		"""Return the current robot state. The state is in (x,y,theta) format"""
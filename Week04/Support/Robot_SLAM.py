@@ -149,6 +149,28 @@ class PenguinPi(object):
 			DH[2*i:2*i+2, 3+2*j:3+2*j+2] = Rot_theta.T
 			
 		return DH
+
+	def derivative_measure_blocks(self, markers, idx_list):
+		# Non-zero blocks of derivative_measure. Measurement i only depends on the robot
+		# and on marker idx_list[i], so the dense DH is zero everywhere except for
+		# - DH_robot: the (2m x 3) columns of the robot state
+		# - DH_markers: an (m x 2 x 2) array, DH_markers[i] is the block of measurement i
+		#   in the columns 3+2*idx_list[i], 3+2*idx_list[i]+1 of its marker
+		th = self.theta
+		Rot_theta = np.block([[np.cos(th), -np.sin(th)],[np.sin(th), np.cos(th)]])
+		DRot_theta = np.block([[-np.sin(th), -np.cos(th)],[np.cos(th), -np.sin(th)]])
+
+		robot_xy = np.array([self.x, self.y]).reshape((2,1))
+		lm_bff = markers[:, idx_list] - robot_xy
+
+		m = len(idx_list)
+		DH_robot = np.zeros((2*m, 3))
+		DH_robot[:, 0:2] = np.tile(-Rot_theta.T, (m, 1))
+		DH_robot[:, 2] = (DRot_theta.T @ lm_bff).reshape(-1, order='F')
+
+		DH_markers = np.broadcast_to(Rot_theta.T, (m, 2, 2))
+
+		return DH_robot, DH_markers
 	
 
 	def covariance_drive(self, drive_meas):
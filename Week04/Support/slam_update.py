@@ -0,0 +1,109 @@
+import numpy as np
+
+
+# EKF-SLAM measurement update that uses the block structure of the measurement
+# Jacobian. The state is ordered as in the Slam class, [x; y; theta; l1x; l1y; ...;
+# lnx; lny], and measurement i only depends on the robot and on marker idx_list[i]
+# (see PenguinPi.derivative_measure_blocks). H is never built: products with H
+# only read the robot columns and the 2 columns of every observed marker, so the
+# update costs O(n^2 m) for n markers and m measurements instead of the O(n^3) of
+# the dense matrix products.
+
+
+def _marker_columns(idx_list):
+	# (m,2) array with the state columns of the marker of every measurement
+	idx = np.asarray(idx_list, dtype=int)
+	return 3 + 2*idx[:, None] + np.arange(2)[None, :]
+
+
+def compute_PHt(P, DH_robot, DH_markers, idx_list):
+	"""
+	Computes P @ H.T from the blocks of H, reading only the observed columns of P
+
+	Method returns an (N x 2m) array, N being the size of the state
+	"""
+	columns = _marker_columns(idx_list)
+	PHt = P[:, 0:3] @ DH_robot.T
+	# Measurement i adds P[:, marker columns] @ DH_markers[i].T to its 2 columns
+	PHt += np.einsum('nik,ijk->nij', P[:, columns], DH_markers).reshape(P.shape[0], -1)
+	return PHt
+
+
+def compute_H_times(A, DH_robot, DH_markers, idx_list):
+	"""
+	Computes H @ A from the blocks of H, reading only the robot and observed marker rows of A
+	"""
+	columns = _marker_columns(idx_list)
+	HA = DH_robot @ A[0:3, :]
+	HA += np.einsum('ijk,ikn->ijn', DH_markers, A[columns, :]).reshape(-1, A.shape[1])
+	return HA
+
+
+def sparse_ekf_update(P, DH_robot, DH_markers, idx_list, residual, R):
+	"""
+	EKF update of a SLAM state with covariance P (N x N) for the measurements of
+	the markers in idx_list, residual = z - z_hat (2m x 1) and measurement covariance R
+
+	The covariance is updated in Joseph form, P - K(HP) - (HP)^T K^T + K S K^T with
+	S = HPH^T + R, which keeps P symmetric positive semi-definite. Rows and
+	columns of P that are not correlated with the observed states have zero rows
+	in K (e.g. markers added since the last update of their neighbours), so only
+	the affected block of P is rewritten
+
+	Method returns the state correction dx (N x 1) and the updated covariance
+	"""
+	PHt = compute_PHt(P, DH_robot, DH_markers, idx_list)
+	S = compute_H_times(PHt, DH_robot, DH_markers, idx_list) + R
+	S = 0.5 * (S + S.T)
+
+	# Only the states correlated with the measurements are corrected
+	affected = np.flatnonzero(np.any(PHt != 0, axis=1))
+	PHt_a = PHt[affected]
+
+	# K = P H^T S^-1, for the affected rows only
+	K_a = np.linalg.solve(S, PHt_a.T).T
+
+	dx = np.zeros((P.shape[0], 1))
+	dx[affected] = K_a @ residual
+
+	# Joseph form, with HP = (PH^T)^T since P is symmetric
+	KHP = K_a @ PHt_a.T
+	block = np.ix_(affected, affected) if len(affected) < P.shape[0] else np.s_[:, :]
+	P_a = P[block] - KHP - KHP.T + (K_a @ S) @ K_a.T
+
+	P = P.copy()
+	P[block] = 0.5 * (P_a + P_a.T)
+
+	return dx, P
+
+
+def slam_update(robot, markers, P, measurements, taglist):
+	"""
+	Sparse version of the update step of the Slam class: corrects the robot state
+	(with robot.set_state) and the 2xn markers from a list of MarkerMeasurements
+	of markers in taglist
+
+	Method returns the corrected markers and covariance
+	"""
+	if not measurements:
+		return markers, P
+
+	# Construct measurement index list
+	idx_list = [taglist.index(lm.tag) for lm in measurements]
+
+	# Stack measurements and set covariance
+	z = np.concatenate([lm.position.reshape(-1,1) for lm in measurements], axis=0)
+	R = np.zeros((2*len(measurements),2*len(measurements)))
+	for i in range(len(measurements)):
+		R[2*i:2*i+2,2*i:2*i+2] = measurements[i].covariance
+
+	z_hat = robot.measure(markers, idx_list).reshape((-1,1), order="F")
+	DH_robot, DH_markers = robot.derivative_measure_blocks(markers, idx_list)
+
+	dx, P = sparse_ekf_update(P, DH_robot, DH_markers, idx_list, z - z_hat, R)
+
+	x, y, theta = robot.get_state()[:, 0] + dx[0:3, 0]
+	robot.set_state(x, y, theta)
+	markers = markers + np.reshape(dx[3:, 0], (2,-1), order='F')
+
+	return markers, P